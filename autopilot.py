@@ -0,0 +1,268 @@
+import heapq, sys, time, weakref
+from collections import deque
+import engine
+
+
+class AUTOPILOT:
+    """Steers a MAIN to the correct fruit along an A* path, keeping clear of walls, its body, bad fruits and obstacles.
+
+    Cells are flat (y * cell_number + x) as in SNAKE.grid. A body block counts
+    as in the way only until the tail has moved off it, so paths can follow
+    the snake's own tail. A path to the fruit is only taken if, once the snake
+    has eaten, its head can still reach its tail. Otherwise the snake chases its
+    tail and tries the fruit again every retry ticks.
+
+    The path is kept between ticks and one cell is taken off it per tick, so
+    normally a tick costs O(1). It is planned again when the fruits respawn or
+    the snake isn't where the path left it, and repaired with a short detour
+    around the blocked cell if the next step becomes blocked. With cache=False
+    every tick plans from scratch, for comparison.
+    """
+
+    def __init__(self, main_game, retry=10, cache=True):
+        self.main_game = main_game
+        self.cell_number = main_game.cell_number
+        self.retry = retry
+        self.cache = cache
+
+        # Cells still to step onto, next first, and what they lead to
+        self.path = deque()
+        self.target = None
+        self.head = None
+        self.wait = 0
+
+        # Stats
+        self.ticks = 0
+        self.plans = 0
+        self.repairs = 0
+        self.fallbacks = 0
+        self.planning_time = 0
+        self.max_planning_time = 0
+
+    def neighbours(self, cell):
+        n = self.cell_number
+        x = cell % n
+        if cell >= n:
+            yield cell - n
+        if x < n - 1:
+            yield cell + 1
+        if cell < n * (n - 1):
+            yield cell + n
+        if x > 0:
+            yield cell - 1
+
+    def hazards(self):
+        """Cells of every bad fruit and obstacle"""
+        correct = self.main_game.correct_fruit
+        return {cell for cell, entity in self.main_game.entities.items() if entity is not correct}
+
+    def free_after(self):
+        """Map of body cell -> number of moves until the tail has left it"""
+        snake = self.main_game.snake
+        length = len(snake.body) + snake.new_block
+        free_at = {}
+        # From the tail up, so a cell the body covers twice waits for the block nearer the head
+        for index in range(len(snake.body) - 1, -1, -1):
+            cell = snake.cell(snake.body[index])
+            if cell is not None:
+                free_at[cell] = length - index
+        return free_at
+
+    def search(self, start, goal, free_at, blocked, start_step=0):
+        """A* path of cells from start (not included) to goal, None if there isn't one.
+
+        A cell is passable at step k if it isn't blocked and free_at says the
+        body is off it by then.
+        """
+        n = self.cell_number
+        goal_x, goal_y = goal % n, goal // n
+        best = {start: 0}
+        came_from = {start: None}
+        # Ties go to the deeper cell, which keeps the search heading for the goal
+        heap = [(abs(start % n - goal_x) + abs(start // n - goal_y), 0, start)]
+        while heap:
+            _, steps, cell = heapq.heappop(heap)
+            steps = -steps
+            if cell == goal:
+                path = []
+                while cell != start:
+                    path.append(cell)
+                    cell = came_from[cell]
+                return path[::-1]
+            if steps > best[cell]:
+                continue
+            for neighbour in self.neighbours(cell):
+                arrive = steps + 1
+                if neighbour in blocked or free_at.get(neighbour, 0) > arrive + start_step:
+                    continue
+                if arrive < best.get(neighbour, arrive + 1):
+                    best[neighbour] = arrive
+                    came_from[neighbour] = cell
+                    distance = abs(neighbour % n - goal_x) + abs(neighbour // n - goal_y)
+                    heapq.heappush(heap, (arrive + distance, -arrive, neighbour))
+        return None
+
+    def safe(self, path, body):
+        """True if, after following path and eating at its end, the head can still reach the tail"""
+        length = len(body)
+        after = path[::-1] + body[:max(0, length - len(path))]
+        after = after[:length]
+        if len(after) < 2:
+            return True
+        return self.search(after[0], after[-1], {}, set(after[:-1])) is not None
+
+    def plan(self):
+        """Path to the correct fruit that leaves the tail reachable, None if there isn't one"""
+        game = self.main_game
+        snake = game.snake
+        self.plans += 1
+        head = snake.cell(snake.body[0])
+        goal = snake.cell(game.correct_fruit.pos)
+        path = self.search(head, goal, self.free_after(), self.hazards())
+        if path is None:
+            return None
+        body = [snake.cell(block) for block in snake.body]
+        if None in body or not self.safe(path, body):
+            return None
+        return path
+
+    def repair(self):
+        """Detour from the head round a blocked next step to the first cell of the path past it"""
+        self.repairs += 1
+        snake = self.main_game.snake
+        free_at = self.free_after()
+        bad = self.hazards()
+        for index, cell in enumerate(self.path):
+            if cell not in bad and free_at.get(cell, 0) <= index + 1:
+                detour = self.search(snake.cell(snake.body[0]), cell, free_at, bad)
+                if detour is not None:
+                    for _ in range(index + 1):
+                        self.path.popleft()
+                    self.path.extendleft(reversed(detour))
+                    return True
+                break
+        self.path.clear()
+        return False
+
+    def fallback(self):
+        """Next cell when there is no safe path to the fruit, towards the tail or into the most room"""
+        self.fallbacks += 1
+        snake = self.main_game.snake
+        head = snake.cell(snake.body[0])
+        tail = snake.cell(snake.body[-1])
+        free_at = self.free_after()
+        bad = self.hazards()
+        if tail is not None and tail != head:
+            path = self.search(head, tail, free_at, bad)
+            if path:
+                return path[0]
+
+        # Otherwise the open neighbour with the most cells reachable from it, counting up to the snake's length
+        best, best_room = None, -1
+        for cell in self.neighbours(head):
+            if cell in bad or free_at.get(cell, 0) > 1:
+                continue
+            room = self.room(cell, free_at, bad, len(snake.body))
+            if room > best_room:
+                best, best_room = cell, room
+        return best
+
+    def room(self, start, free_at, blocked, limit):
+        seen = {start}
+        queue = deque([start])
+        while queue and len(seen) < limit:
+            for cell in self.neighbours(queue.popleft()):
+                if cell not in seen and cell not in blocked and free_at.get(cell, 0) <= 1:
+                    seen.add(cell)
+                    queue.append(cell)
+        return len(seen)
+
+    def blocked(self, cell):
+        """True if stepping onto cell next tick would hit the body, a bad fruit or an obstacle"""
+        game = self.main_game
+        snake = game.snake
+        if game.entities.get(cell) not in (None, game.correct_fruit):
+            return True
+        if not snake.grid[cell]:
+            return False
+        # Only the tail's own cell frees up in time, and only if the snake isn't growing
+        return not (cell == snake.cell(snake.body[-1]) and snake.grid[cell] == 1 and not snake.new_block)
+
+    def next_cell(self):
+        game = self.main_game
+        snake = game.snake
+        head = snake.cell(snake.body[0])
+        target = (game.correct_fruit, game.correct_fruit.pos, game.bad_fruit.pos)
+
+        if not self.cache or target != self.target or head != self.head:
+            # The fruits respawned, the game was reset or something else moved the snake
+            self.path.clear()
+            self.target = target
+            self.wait = 0
+        if self.path and self.blocked(self.path[0]):
+            self.repair()
+
+        if not self.path and not self.wait:
+            path = self.plan()
+            if path is None:
+                self.wait = self.retry
+            else:
+                self.path.extend(path)
+
+        if self.path:
+            return self.path.popleft()
+        self.wait -= 1
+        return self.fallback()
+
+    def act(self):
+        """Action for this tick, None if every way is blocked"""
+        start = time.perf_counter()
+        snake = self.main_game.snake
+        head = snake.cell(snake.body[0])
+        cell = self.next_cell() if head is not None else None
+        self.head = cell
+
+        elapsed = time.perf_counter() - start
+        self.ticks += 1
+        self.planning_time += elapsed
+        self.max_planning_time = max(self.max_planning_time, elapsed)
+        if cell is None:
+            return None
+        step = cell - head
+        n = self.cell_number
+        return {-n: engine.UP, 1: engine.RIGHT, n: engine.DOWN, -1: engine.LEFT}[step]
+
+    def report(self):
+        if not self.ticks:
+            return "Autopilot never ran"
+        return (f"Autopilot: {self.ticks} ticks, {self.plans} plans, {self.repairs} repairs, "
+                f"{self.fallbacks} ticks without a safe path, planning {self.planning_time / self.ticks * 1000:.3f} ms/tick "
+                f"(max {self.max_planning_time * 1000:.2f} ms)")
+
+
+pilots = weakref.WeakKeyDictionary()
+
+
+def autopilot_policy(main_game):
+    """AUTOPILOT as a tournament policy, one per game"""
+    if main_game not in pilots:
+        pilots[main_game] = AUTOPILOT(main_game)
+    return pilots[main_game].act()
+
+
+def benchmark(cell_numbers=(20, 100, 500), ticks=2000, seed=0):
+    """Planning time per tick with the cached path against planning every tick, and the score reached"""
+    for cell_number in cell_numbers:
+        for cache in (True, False):
+            main_game = engine.MAIN(cell_number, seed)
+            pilot = AUTOPILOT(main_game, cache=cache)
+            deaths = 0
+            for _ in range(ticks):
+                deaths += main_game.step(pilot.act()) == engine.GAME_OVER
+            print(f"board {cell_number:>4} {'cached ' if cache else 'replans'}: "
+                  f"{pilot.planning_time / ticks * 1000:8.3f} ms/tick, {pilot.plans:>5} plans, "
+                  f"length {len(main_game.snake.body)}, {deaths} deaths")
+
+
+if __name__ == '__main__':
+    benchmark(ticks=int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
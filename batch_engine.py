@@ -0,0 +1,297 @@
+import sys, time
+import numpy as np
+import engine
+from engine import UP, RIGHT, DOWN, LEFT, NOTHING, CORRECT, WRONG, GAME_OVER
+from question_bank import OPERATORS, OPERATOR_CODES, shared_pool
+
+# Direction deltas indexed by action, same order as engine.DIRECTIONS
+DIRECTION_X = np.array([0, 1, 0, -1], dtype=np.int8)
+DIRECTION_Y = np.array([-1, 0, 1, 0], dtype=np.int8)
+
+# Starting body from SNAKE.reset, stored tail first to match the ring buffer order
+START_X = np.array([3, 4, 5], dtype=np.int32)
+START_Y = np.array([10, 10, 10], dtype=np.int32)
+
+
+class BATCH:
+    """Runs many independent games at once with the same rules as engine.MAIN.
+
+    Every piece of game state is an array with one row per game. Each body is a
+    ring buffer (head at self.head, tail length - 1 slots behind it) plus a grid
+    counting how many body blocks sit on each cell, so a whole tick is a handful
+    of vectorized operations whatever the number of games or snake lengths.
+    Empty cells are kept per game the same way as engine.FREE_CELLS, so fruit
+    never spawns on the snake or the other fruit. Questions come from the
+    generated pool for tier, dealt from a question_bank.DECK per game.
+    """
+
+    def __init__(self, games, cell_number=engine.CELL_NUMBER, seed=None, tier=1):
+        if cell_number <= START_X.max():
+            raise ValueError(f"cell_number must be greater than {START_X.max()} to fit the starting snake")
+
+        self.games = games
+        self.cell_number = cell_number
+        # A snake can never be longer than the board plus the block it grows into
+        self.capacity = cell_number * cell_number + 1
+        self.rng = np.random.default_rng(seed)
+        self.index = np.arange(games)
+
+        self.body_x = np.zeros((games, self.capacity), dtype=np.int32)
+        self.body_y = np.zeros((games, self.capacity), dtype=np.int32)
+        self.head = np.zeros(games, dtype=np.int64)
+        self.length = np.zeros(games, dtype=np.int64)
+        self.occupancy = np.zeros((games, cell_number, cell_number), dtype=np.int16)
+        self.direction_x = np.zeros(games, dtype=np.int8)
+        self.direction_y = np.zeros(games, dtype=np.int8)
+        self.new_block = np.zeros(games, dtype=bool)
+
+        # The tier's questions as columns, op holds question_bank.OPERATOR_CODES
+        pool = shared_pool(tier)
+        a, op, b = zip(*pool.questions)
+        self.pool_a = np.array(a, dtype=np.int64)
+        self.pool_op = np.array([OPERATOR_CODES[symbol] for symbol in op], dtype=np.int8)
+        self.pool_b = np.array(b, dtype=np.int64)
+        self.pool_answer = np.array([OPERATORS[symbol](x, y) for x, symbol, y in pool.questions], dtype=np.int64)
+        self.answer_low = pool.low
+        self.answer_high = max(pool.high, pool.low + 1)
+        self.deck_stride = np.zeros(games, dtype=np.int64)
+        self.deck_offset = np.zeros(games, dtype=np.int64)
+        self.deck_position = np.zeros(games, dtype=np.int64)
+
+        self.a = np.zeros(games, dtype=np.int64)
+        self.op = np.zeros(games, dtype=np.int8)
+        self.b = np.zeros(games, dtype=np.int64)
+        self.answer = np.zeros(games, dtype=np.int64)
+        self.wrong_answer = np.zeros(games, dtype=np.int64)
+        self.correct_x = np.zeros(games, dtype=np.int32)
+        self.correct_y = np.zeros(games, dtype=np.int32)
+        self.bad_x = np.zeros(games, dtype=np.int32)
+        self.bad_y = np.zeros(games, dtype=np.int32)
+
+        # Flat cells (y * cell_number + x) as in engine.FREE_CELLS, used counts snake blocks and fruits
+        cells = cell_number * cell_number
+        self.used = np.zeros((games, cells), dtype=np.int16)
+        self.free = np.tile(np.arange(cells, dtype=np.int32), (games, 1))
+        self.free_index = np.tile(np.arange(cells, dtype=np.int32), (games, 1))
+        self.free_count = np.full(games, cells, dtype=np.int64)
+
+        self.event = np.zeros(games, dtype=np.int8)
+
+        self.reset_snakes(self.index)
+        self.shuffle_decks(self.index)
+        self.new_questions(self.index)
+        self.place_fruits(self.index)
+
+    def reset_snakes(self, games):
+        """Same as SNAKE.reset, new_block is deliberately left alone"""
+        # Hand the old bodies back a block at a time, one vectorized release per body index
+        lengths = self.length[games]
+        for block in range(lengths.max(initial=0)):
+            body = games[lengths > block]
+            slot = (self.head[body] - block) % self.capacity
+            x, y = self.body_x[body, slot], self.body_y[body, slot]
+            # A head that just left the board never took a cell
+            inside = (x >= 0) & (x < self.cell_number) & (y >= 0) & (y < self.cell_number)
+            body, x, y = body[inside], x[inside], y[inside]
+            self.occupancy[body, x, y] -= 1
+            self.release(body, y * self.cell_number + x)
+
+        self.body_x[games, :3] = START_X
+        self.body_y[games, :3] = START_Y
+        self.head[games] = 2
+        self.length[games] = 3
+        for x, y in zip(START_X, START_Y):
+            self.occupancy[games, x, y] += 1
+            self.take(games, np.full(len(games), y * self.cell_number + x))
+        self.direction_x[games] = 0
+        self.direction_y[games] = 0
+
+    def take(self, games, cells):
+        """Vectorized FREE_CELLS.take, each game can appear only once"""
+        self.used[games, cells] += 1
+        taken = self.used[games, cells] == 1
+        games, cells = games[taken], cells[taken]
+        slot = self.free_index[games, cells]
+        self.free_count[games] -= 1
+        last = self.free[games, self.free_count[games]]
+        self.free[games, slot] = last
+        self.free_index[games, last] = slot
+        self.free_index[games, cells] = -1
+
+    def release(self, games, cells):
+        """Vectorized FREE_CELLS.release, each game can appear only once"""
+        self.used[games, cells] -= 1
+        freed = self.used[games, cells] == 0
+        games, cells = games[freed], cells[freed]
+        self.free_index[games, cells] = self.free_count[games]
+        self.free[games, self.free_count[games]] = cells
+        self.free_count[games] += 1
+
+    def random_cells(self, games):
+        """A uniformly random empty cell for each game, any cell when the board is full"""
+        count = self.free_count[games]
+        picks = self.free[games, (self.rng.random(len(games)) * count).astype(np.int64)]
+        full = count == 0
+        picks[full] = self.rng.integers(0, self.cell_number * self.cell_number, full.sum())
+        return picks
+
+    def shuffle_decks(self, games):
+        """Vectorized DECK.shuffle"""
+        size = len(self.pool_a)
+        stride = self.rng.integers(1, size + 1, len(games))
+        shared = np.gcd(stride, size) != 1
+        while shared.any():
+            stride[shared] += 1
+            shared = np.gcd(stride, size) != 1
+        self.deck_stride[games] = stride
+        self.deck_offset[games] = self.rng.integers(0, size, len(games))
+        self.deck_position[games] = 0
+
+    def new_questions(self, games):
+        """Same as QUESTIONS.new_question plus picking the wrong answer in MAIN.new_fruits"""
+        size = len(self.pool_a)
+        self.shuffle_decks(games[self.deck_position[games] == size])
+        dealt = (self.deck_stride[games] * self.deck_position[games] + self.deck_offset[games]) % size
+        self.deck_position[games] += 1
+        self.a[games] = self.pool_a[dealt]
+        self.op[games] = self.pool_op[dealt]
+        self.b[games] = self.pool_b[dealt]
+        self.answer[games] = self.pool_answer[dealt]
+
+        # Same as QUESTION_BANK.distractors, the range without the answer
+        wrong = self.rng.integers(self.answer_low, self.answer_high, len(games))
+        wrong += wrong >= self.answer[games]
+        self.wrong_answer[games] = wrong
+
+    def place_fruits(self, games):
+        """Put both fruits on empty cells, the correct one first so the bad one avoids it"""
+        cells = self.random_cells(games)
+        self.take(games, cells)
+        self.correct_x[games] = cells % self.cell_number
+        self.correct_y[games] = cells // self.cell_number
+
+        cells = self.random_cells(games)
+        self.take(games, cells)
+        self.bad_x[games] = cells % self.cell_number
+        self.bad_y[games] = cells // self.cell_number
+
+    def respawn_fruits(self, games):
+        self.release(games, self.correct_y[games] * self.cell_number + self.correct_x[games])
+        self.release(games, self.bad_y[games] * self.cell_number + self.bad_x[games])
+        self.place_fruits(games)
+
+    def heads(self):
+        return self.body_x[self.index, self.head], self.body_y[self.index, self.head]
+
+    def body(self, game):
+        """Body of one game as (x, y) tuples, head first like SNAKE.body"""
+        slots = (self.head[game] - np.arange(self.length[game])) % self.capacity
+        return list(zip(self.body_x[game, slots].tolist(), self.body_y[game, slots].tolist()))
+
+    def drop_tails(self, games):
+        tail = (self.head[games] - self.length[games] + 1) % self.capacity
+        tail_x, tail_y = self.body_x[games, tail], self.body_y[games, tail]
+        self.occupancy[games, tail_x, tail_y] -= 1
+        self.release(games, tail_y * self.cell_number + tail_x)
+        self.length[games] -= 1
+
+    def turn(self, actions):
+        """Vectorized MAIN.turn, an action of -1 keeps the current direction"""
+        actions = np.asarray(actions)
+        allowed = (((actions == UP) & (self.direction_y != 1)) |
+                   ((actions == RIGHT) & (self.direction_x != -1)) |
+                   ((actions == DOWN) & (self.direction_y != -1)) |
+                   ((actions == LEFT) & (self.direction_x != 1)))
+        self.direction_x[allowed] = DIRECTION_X[actions[allowed]]
+        self.direction_y[allowed] = DIRECTION_Y[actions[allowed]]
+
+    def move_snakes(self):
+        moving = self.index[(self.direction_x != 0) | (self.direction_y != 0)]
+        growing = self.new_block[moving]
+        self.drop_tails(moving[~growing])
+        self.new_block[moving[growing]] = False
+
+        head_x = self.body_x[moving, self.head[moving]] + self.direction_x[moving]
+        head_y = self.body_y[moving, self.head[moving]] + self.direction_y[moving]
+        self.head[moving] = (self.head[moving] + 1) % self.capacity
+        self.length[moving] += 1
+        self.body_x[moving, self.head[moving]] = head_x
+        self.body_y[moving, self.head[moving]] = head_y
+
+        # Heads that left the board are reset by check_fail, so they never enter the grid
+        inside = (head_x >= 0) & (head_x < self.cell_number) & (head_y >= 0) & (head_y < self.cell_number)
+        self.occupancy[moving[inside], head_x[inside], head_y[inside]] += 1
+        self.take(moving[inside], head_y[inside] * self.cell_number + head_x[inside])
+
+    def check_collision(self):
+        head_x, head_y = self.heads()
+        correct = (head_x == self.correct_x) & (head_y == self.correct_y)
+        bad = ~correct & (head_x == self.bad_x) & (head_y == self.bad_y)
+
+        self.new_block[correct] = True
+        self.event[correct] = CORRECT
+
+        bad = self.index[bad]
+        shrinking = self.length[bad] > 3
+        self.drop_tails(bad[shrinking])
+        self.event[bad[shrinking]] = WRONG
+        self.game_over(bad[~shrinking])
+
+        respawn = self.index[correct | (self.event == WRONG)]
+        self.new_questions(respawn)
+        self.respawn_fruits(respawn)
+
+    def check_fail(self):
+        moving = (self.direction_x != 0) | (self.direction_y != 0)
+        head_x, head_y = self.heads()
+        inside = (head_x >= 0) & (head_x < self.cell_number) & (head_y >= 0) & (head_y < self.cell_number)
+        # Clip so the lookup is valid for every game, the result only counts for heads inside
+        hits = self.occupancy[self.index,
+                              np.clip(head_x, 0, self.cell_number - 1),
+                              np.clip(head_y, 0, self.cell_number - 1)] > 1
+        self.game_over(self.index[moving & (~inside | hits)])
+
+    def game_over(self, games):
+        self.event[games] = GAME_OVER
+        self.reset_snakes(games)
+
+    def step(self, actions):
+        """Advance every game one tick, returns the event array for this tick"""
+        self.event[:] = NOTHING
+        self.turn(actions)
+        self.move_snakes()
+        self.check_collision()
+        self.check_fail()
+        return self.event
+
+
+def benchmark(games=4096, steps=1000, seed=0):
+    """Ticks per second for BATCH against looping engine.MAIN over the same number of games"""
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(-3, 4, (steps, games))
+    actions[actions < 0] = -1
+
+    batch = BATCH(games, seed=seed)
+    start = time.perf_counter()
+    for tick in actions:
+        batch.step(tick)
+    batch_rate = games * steps / (time.perf_counter() - start)
+
+    # Looping MAIN is much slower, so time it on a slice of the actions
+    loop_steps = max(1, steps // 10)
+    mains = [engine.MAIN() for _ in range(games)]
+    start = time.perf_counter()
+    for tick in actions[:loop_steps].tolist():
+        for main, action in zip(mains, tick):
+            main.step(None if action < 0 else action)
+    loop_rate = games * loop_steps / (time.perf_counter() - start)
+
+    return batch_rate, loop_rate
+
+
+if __name__ == '__main__':
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    batch_rate, loop_rate = benchmark(games)
+    print(f"BATCH:     {batch_rate:,.0f} game ticks/sec over {games:,} games")
+    print(f"MAIN loop: {loop_rate:,.0f} game ticks/sec")
+    print(f"Speedup:   {batch_rate / loop_rate:.1f}x")
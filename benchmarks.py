@@ -0,0 +1,162 @@
+import json, os, platform, statistics, sys, time
+
+# Everything is drawn to an invisible window, so this runs on servers and in CI
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import pygame
+import engine
+from camera import serpentine
+
+GRID_SIZES = (20, 100, 1000)
+LENGTHS = (3, 100, 1000, 10000)
+# Slower than the baseline by more than this fraction counts as a regression. Runs are
+# compared on their best time, which is far less noisy than the median on a busy machine.
+THRESHOLD = 0.15
+
+
+def make_game(game, cell_number, length):
+    """game.MAIN with a snake of length zigzagging from the top left, heading down into the empty rows"""
+    game.init_display(cell_number)
+    main_game = game.MAIN(cell_number, seed=0)
+    body = serpentine(cell_number, length)
+    main_game.snake.restore([int(b.y) * cell_number + int(b.x) for b in body], engine.DIRECTIONS[engine.DOWN], False)
+    game.camera.follow(main_game.snake.body[0])
+    return main_game
+
+
+def measure(function, repeats=5, target=0.02):
+    """Median and best seconds per call over repeats runs, each with enough calls to take about target seconds"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= target or number >= 1 << 20:
+            break
+        number *= 2
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return statistics.median(times), min(times), number
+
+
+def loop(cell_number, head, rows):
+    """Actions round a closed loop through every cell of the rows below head, starting under it.
+
+    The loop runs along the first of the rows, zigzags through the others
+    leaving out the left column and comes back up that column, so rows has to
+    be even. A snake no longer than the loop minus one can follow it for ever.
+    """
+    top = int(head.y) + 1
+    cells = [(x, top) for x in range(cell_number)]
+    for k in range(1, rows):
+        xs = range(cell_number - 1, 0, -1) if k % 2 else range(1, cell_number)
+        cells += [(x, top + k) for x in xs]
+    cells += [(0, top + k) for k in range(rows - 1, 0, -1)]
+    # Start on the cell below the head
+    start = cells.index((int(head.x), top))
+    cells = cells[start:] + cells[:start]
+    return [engine.DIRECTIONS.index(pygame.Vector2(x1 - x0, y1 - y0))
+            for (x0, y0), (x1, y1) in zip(cells, cells[1:] + cells[:1])]
+
+
+def cases(game, cell_number, length):
+    """name -> (game, function) for one board size and snake length.
+
+    Each case has a game of its own, none of them end it or change the snake's length.
+    """
+    moving = make_game(game, cell_number, length)
+    # The loop fills enough empty rows below the snake to hold all of it and one free cell
+    rows = -(-(length + 1) // cell_number)
+    # The snake is heading down, so its first move is onto the loop
+    actions = loop(cell_number, moving.snake.body[0], rows + rows % 2)
+    moves = [0]
+
+    def move_snake():
+        moving.snake.move_snake()
+        moving.snake.direction = engine.DIRECTIONS[actions[moves[0] % len(actions)]]
+        moves[0] += 1
+
+    # Made last, so the camera is on this game's snake
+    main_game = make_game(game, cell_number, length)
+
+    def draw_elements():
+        game.screen.fill((175, 215, 70))
+        main_game.draw_elements()
+
+    # The head is never on a fruit or another block, so these time the usual nothing-happened tick
+    return {
+        'move_snake': (moving, move_snake),
+        'check_fail': (main_game, main_game.check_fail),
+        'check_collision': (main_game, main_game.check_collision),
+        'draw_snake': (main_game, main_game.snake.draw_snake),
+        'draw_grass': (main_game, main_game.draw_grass),
+        'draw_elements': (main_game, draw_elements),
+    }
+
+
+def run(grid_sizes=GRID_SIZES, lengths=LENGTHS):
+    import game
+
+    pygame.init()
+    results = {}
+    for cell_number in grid_sizes:
+        for length in lengths:
+            # Leave room for the fruit, as camera.benchmark does
+            if length > cell_number * cell_number // 2:
+                continue
+            for name, (main_game, function) in cases(game, cell_number, length).items():
+                assert len(main_game.snake.body) == length, (name, len(main_game.snake.body))
+                seconds, best, number = measure(function)
+                assert len(main_game.snake.body) == length, (name, len(main_game.snake.body))
+                key = f"{name} grid={cell_number} length={length}"
+                results[key] = {'seconds': seconds, 'best': best, 'calls': number}
+                print(f"{key:<45} {seconds * 1e6:12.2f} us median {best * 1e6:12.2f} us best")
+    return results
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({'python': platform.python_version(), 'pygame': pygame.version.ver,
+                   'machine': platform.platform(), 'results': results}, f, indent=1)
+
+
+def compare(results, baseline_path, threshold=THRESHOLD):
+    """Print every benchmark against the baseline, returns the names that got slower by more than threshold"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            print(f"{key:<45} new")
+            continue
+        ratio = result['best'] / baseline[key]['best']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print(f"{key:<45} {baseline[key]['best'] * 1e6:12.2f} -> {result['best'] * 1e6:12.2f} us {ratio:6.2f}x {flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    # python benchmarks.py [results.json] [baseline.json] [threshold], exits with 1 if anything regressed
+    output = sys.argv[1] if len(sys.argv) > 1 else 'benchmark_results.json'
+    baseline = sys.argv[2] if len(sys.argv) > 2 else None
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else THRESHOLD
+
+    results = run()
+    save(output, results)
+    print(f"Results saved to '{output}'")
+
+    if baseline:
+        regressions = compare(results, baseline, threshold)
+        print(f"{len(regressions)} regression(s) over {threshold:.0%} against '{baseline}'")
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,83 @@
+import os, time
+import pygame
+from pygame.math import Vector2
+
+
+class CAMERA:
+    """The part of the board on screen, at most view_cells across, kept centred on a cell.
+
+    x and y are the world cell in the top left corner. When the whole board fits
+    in the view they stay at 0, so small boards draw exactly as before.
+    """
+
+    def __init__(self, cell_number, view_cells):
+        self.cell_number = cell_number
+        self.view_cells = min(view_cells, cell_number)
+        self.x = 0
+        self.y = 0
+
+    def follow(self, pos):
+        """Centre on pos without showing anything past the edge of the board"""
+        limit = self.cell_number - self.view_cells
+        self.x = min(max(int(pos.x) - self.view_cells // 2, 0), limit)
+        self.y = min(max(int(pos.y) - self.view_cells // 2, 0), limit)
+
+    def cell_rect(self, pos, cell_size):
+        """Screen rect of the world cell at pos, None when it is outside the view"""
+        col, row = int(pos.x) - self.x, int(pos.y) - self.y
+        if 0 <= col < self.view_cells and 0 <= row < self.view_cells:
+            return pygame.Rect(col * cell_size, row * cell_size, cell_size, cell_size)
+        return None
+
+
+def serpentine(cell_number, length):
+    """Body of the given length zigzagging across the board from the top left, head first"""
+    body = []
+    for row in range(cell_number):
+        cols = range(cell_number) if row % 2 == 0 else range(cell_number - 1, -1, -1)
+        for col in cols:
+            body.append(Vector2(col, row))
+            if len(body) == length:
+                return body[::-1]
+    return body[::-1]
+
+
+def benchmark(world_sizes=(20, 100, 1000), lengths=(3, 100, 1000, 10000), frames=60):
+    """Frame time of a full draw_elements repaint and a RENDERER frame for each world size and snake length"""
+    import engine
+    import game
+    from renderer import RENDERER
+
+    pygame.init()
+    for cell_number in world_sizes:
+        game.init_display(cell_number)
+        for length in lengths:
+            # Leave room for the fruit
+            if length > cell_number * cell_number // 2:
+                continue
+            main_game = game.MAIN(cell_number)
+            # restore keeps the occupancy grid and game.SNAKE's tiles in step with the new body
+            body = serpentine(cell_number, length)
+            main_game.snake.restore([int(b.y) * cell_number + int(b.x) for b in body], engine.DIRECTIONS[engine.DOWN], False)
+
+            start = time.perf_counter()
+            for _ in range(frames):
+                game.screen.fill((175, 215, 70))
+                main_game.draw_elements()
+            full_time = (time.perf_counter() - start) / frames
+
+            renderer = RENDERER(game.window, main_game, cell_size=game.cell_size, camera=game.camera)
+            start = time.perf_counter()
+            for _ in range(frames):
+                # Pretend the game ticked so the board is rebuilt every frame
+                main_game.ticks += 1
+                renderer.draw()
+            tick_time = (time.perf_counter() - start) / frames
+
+            print(f"world {cell_number:>5}x{cell_number:<5} length {length:>6}: "
+                  f"draw_elements {full_time * 1000:7.3f} ms, renderer tick frame {tick_time * 1000:7.3f} ms")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    benchmark()
@@ -0,0 +1,592 @@
+import math, random, struct, sys, time
+from array import array
+from collections import deque
+from pygame.math import Vector2
+from question_bank import QUESTION_BANK, OPERATORS, OPERATOR_CODES, OPERATOR_SYMBOLS
+
+# Pure game rules, no display needed. game.py subclasses these to add drawing.
+CELL_NUMBER = 20
+
+# Actions accepted by MAIN.step, None keeps the current direction
+UP, RIGHT, DOWN, LEFT = range(4)
+DIRECTIONS = [Vector2(0, -1), Vector2(1, 0), Vector2(0, 1), Vector2(-1, 0)]
+
+# Turns buffered by MAIN.queue_turn beyond this are ignored, the ones already queued were pressed first
+MAX_QUEUED_TURNS = 3
+
+# Events returned by MAIN.step
+NOTHING, CORRECT, WRONG, GAME_OVER = range(4)
+
+# Status shown for each event
+STATUS = {
+    CORRECT: ("Correct! +1 Length", (0, 255, 0)),
+    WRONG: ("Wrong! -1 Length", (255, 0, 0)),
+    GAME_OVER: ("Game Over!", (255, 165, 0)),
+}
+
+# Layout of MAIN.snapshot, all little endian: version, flags (1 = new_block, 2 = exact, 4 = arena),
+# cell_number, ticks, direction (4 = standing still), event, status event, number of queued turns,
+# the queued turns, tier, operator code, a, b, correct fruit cell and answer, bad fruit cell and
+# answer, body length. The body follows as one uint32 cell (y * cell_number + x) per block, head
+# first. A game with more than one bad fruit or any obstacles (an arena) then has the number of
+# other bad fruits and of obstacles, the other bad fruits' uint32 cells and int32 answers and the
+# obstacles' uint32 cells. An exact snapshot then has the question deck's stride, offset and
+# position, the rng state and the order of FREE_CELLS.cells, count first, which fruit spawning
+# depends on.
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct(f'<BBHIBBBB{MAX_QUEUED_TURNS}BBBiiIiIiI')
+ARENA_COUNTS = struct.Struct('<II')
+DECK_STATE = struct.Struct('<III')
+# random.Random's state: 624 words plus the position, then whether gauss_next is set and its value
+RNG_STATE = struct.Struct('<625IBd')
+STILL = 4
+
+
+class FREE_CELLS:
+    """Every empty cell of the board in a dense list, plus each cell's index in that list.
+
+    take/release count how many things sit on a cell. A cell leaves the list when
+    its count goes above zero and comes back when it drops to zero, both O(1) by
+    swapping with the last entry, so picking a uniformly random empty cell is O(1)
+    however full the board is.
+    """
+
+    def __init__(self, cell_number=CELL_NUMBER):
+        self.cell_number = cell_number
+        self.cells = list(range(cell_number * cell_number))
+        self.index = list(range(cell_number * cell_number))
+        self.used = [0] * (cell_number * cell_number)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return self.index[cell] >= 0
+
+    def take(self, cell):
+        self.used[cell] += 1
+        if self.used[cell] == 1:
+            # Move the last free cell into this one's slot
+            last = self.cells.pop()
+            if last != cell:
+                self.cells[self.index[cell]] = last
+                self.index[last] = self.index[cell]
+            self.index[cell] = -1
+
+    def release(self, cell):
+        self.used[cell] -= 1
+        if self.used[cell] == 0:
+            self.index[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def random_cell(self, rng=random):
+        """A uniformly random empty cell, None when the board is full"""
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+
+class SNAKE:
+    def __init__(self, cell_number=CELL_NUMBER, free_cells=None):
+        self.cell_number = cell_number
+        # Told about every cell the snake moves onto or off, if given
+        self.free_cells = free_cells
+        self.new_block = False
+        self.body = deque()
+        self.grid = [0] * (cell_number * cell_number)
+        self.reset()
+
+    def cell(self, pos):
+        """Index of pos in the occupancy grid, None when it is off the board"""
+        x, y = int(pos.x), int(pos.y)
+        if 0 <= x < self.cell_number and 0 <= y < self.cell_number:
+            return y * self.cell_number + x
+        return None
+
+    def occupy(self, pos):
+        cell = self.cell(pos)
+        if cell is not None:
+            self.grid[cell] += 1
+            if self.free_cells is not None:
+                self.free_cells.take(cell)
+
+    def vacate(self, pos):
+        cell = self.cell(pos)
+        if cell is not None:
+            self.grid[cell] -= 1
+            if self.free_cells is not None:
+                self.free_cells.release(cell)
+
+    def move_snake(self):
+        if self.direction == Vector2(0, 0):
+            return
+
+        if self.new_block:
+            # Keep the tail so the snake grows by one,
+            # revert flag back to false so that snake doesnt keep extending
+            self.new_block = False
+        else:
+            self.drop_tail()
+
+        self.add_head(self.body[0] + self.direction)
+
+    def add_head(self, pos):
+        """Put a new head on at pos. Other than reset and restore, which replace the whole
+        body, blocks are only ever added here and removed in drop_tail"""
+        self.body.appendleft(pos)
+        self.occupy(pos)
+
+    def drop_tail(self):
+        """Take the tail block off"""
+        self.vacate(self.body.pop())
+
+    def hit_self(self):
+        """True when another block shares the head's cell"""
+        cell = self.cell(self.body[0])
+        return cell is not None and self.grid[cell] > 1
+
+    def add_block(self):
+        self.new_block = True
+
+    def remove_block(self):
+        if len(self.body) > 3:
+            self.drop_tail()
+            return False
+        else:
+            return True
+
+    def restore(self, cells, direction, new_block):
+        """Replace the body with one built from flat cells, head first"""
+        for block in self.body:
+            self.vacate(block)
+        self.body = deque(Vector2(cell % self.cell_number, cell // self.cell_number) for cell in cells)
+        for block in self.body:
+            self.occupy(block)
+        self.direction = direction
+        self.new_block = new_block
+
+    def reset(self):
+        # body is a deque with the head on the left, grid counts the blocks on each cell
+        for block in self.body:
+            self.vacate(block)
+        self.body = deque([Vector2(5, 10), Vector2(4, 10), Vector2(3, 10)])
+        self.direction = Vector2(0, 0)
+        for block in self.body:
+            self.occupy(block)
+
+
+class ENTITY:
+    """Something sitting on one cell of the board, a fruit or an obstacle.
+
+    It only spawns on empty cells when given the board's free cells, and keeps
+    its cell out of them until removed. Given the game's entities dict it is
+    listed there under its flat cell (y * cell_number + x) while placed.
+    """
+
+    def __init__(self, cell_number=CELL_NUMBER, free_cells=None, rng=random, entities=None):
+        self.cell_number = cell_number
+        self.free_cells = free_cells
+        self.entities = entities
+        self.rng = rng
+        self.cell = None
+        self.randomize()
+
+    def randomize(self):
+        self.remove()
+        cell = self.free_cells.random_cell(self.rng) if self.free_cells is not None else None
+        if cell is None:
+            self.place(self.rng.randint(0, self.cell_number - 1), self.rng.randint(0, self.cell_number - 1))
+        else:
+            self.place(cell % self.cell_number, cell // self.cell_number)
+
+    def place(self, x, y):
+        self.remove()
+        self.x, self.y = x, y
+        self.pos = Vector2(self.x, self.y)
+        self.cell = self.y * self.cell_number + self.x
+
+        if self.free_cells is not None:
+            self.free_cells.take(self.cell)
+        if self.entities is not None:
+            self.entities[self.cell] = self
+
+    def remove(self):
+        """Give the cell back to the free cells and take it out of entities"""
+        if self.cell is None:
+            return
+        if self.free_cells is not None:
+            self.free_cells.release(self.cell)
+        # Only on a full board can two entities share a cell, the one placed last is listed
+        if self.entities is not None and self.entities.get(self.cell) is self:
+            del self.entities[self.cell]
+        self.cell = None
+
+
+class FRUIT(ENTITY):
+    def __init__(self, answer, cell_number=CELL_NUMBER, free_cells=None, rng=random, entities=None):
+        self.answer = answer
+        super().__init__(cell_number, free_cells, rng, entities)
+
+
+class OBSTACLE(ENTITY):
+    """A cell the snake can't go through, running into it is game over"""
+
+
+class QUESTIONS:
+    def __init__(self, rng=random, bank=None, tier=1):
+        self.rng = rng
+        self.bank = bank if bank is not None else QUESTION_BANK(rng)
+        self.tier = tier
+        self.status = None
+        self.status_color = None
+        self.status_timer = 0
+        self.new_question()
+
+    def set_status(self, text, color):
+        self.status = text
+        self.status_color = color
+
+    def new_question(self):
+        a, op, b = self.bank.deal(self.tier)
+        self.set_question(a, b, op)
+
+    def set_question(self, a, b, op='+'):
+        self.a = a
+        self.b = b
+        self.op = op
+        self.text = f"{self.a} {self.op} {self.b} = ?"
+        self.answer = OPERATORS[op](a, b)
+
+    def distractors(self, count=1):
+        """count different wrong answers for the current question"""
+        return self.bank.distractors(self.tier, self.answer, count)
+
+
+class MAIN:
+    # Subclasses swap these for versions that can draw themselves
+    snake_class = SNAKE
+    fruit_class = FRUIT
+    obstacle_class = OBSTACLE
+    question_class = QUESTIONS
+
+    def __init__(self, cell_number=CELL_NUMBER, seed=None, tier=1, pools=None, distractors=1, obstacles=0):
+        """distractors is how many wrong answer fruits there are at once, at least one, and
+        obstacles how many blocked cells are scattered over the board for the whole game"""
+        self.cell_number = cell_number
+        self.tier = tier
+        # All of a game's randomness comes from here, so a seed replays it exactly
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.free_cells = FREE_CELLS(cell_number)
+        self.snake = self.snake_class(cell_number, self.free_cells)
+        # pools can add question_bank.CURRICULUM tiers, the bank shares the game's rng so seeds still replay
+        self.question = self.question_class(self.rng, QUESTION_BANK(self.rng, pools), tier)
+        # Every fruit and obstacle by flat cell, whatever the head runs into is one lookup
+        self.entities = {}
+        self.obstacles = [self.obstacle_class(cell_number, self.free_cells, self.rng, self.entities) for _ in range(obstacles)]
+        self.distractors = distractors
+        self.correct_fruit = self.bad_fruit = None
+        self.bad_fruits = []
+        self.event = NOTHING
+        self.inputs = deque()
+        self.tick_direction = self.snake.direction
+        # Counts updates, anything drawn from the game state only changes when this does
+        self.ticks = 0
+        self.new_fruits()
+
+    def new_fruits(self):
+        for fruit in (self.correct_fruit, *self.bad_fruits):
+            if fruit is not None:
+                fruit.remove()
+
+        self.correct_fruit = self.fruit_class(self.question.answer, self.cell_number, self.free_cells, self.rng, self.entities)
+        self.bad_fruits = [self.fruit_class(answer, self.cell_number, self.free_cells, self.rng, self.entities)
+                           for answer in self.question.distractors(self.distractors)]
+        # The first, for everything that only knows about one wrong answer
+        self.bad_fruit = self.bad_fruits[0]
+
+    def turn(self, action):
+        """Change direction the same way the arrow keys do, ignoring reversals.
+        Returns True if the direction changed"""
+        direction = self.snake.direction
+        if action == UP and direction.y != 1:
+            self.snake.direction = DIRECTIONS[UP]
+        elif action == RIGHT and direction.x != -1:
+            self.snake.direction = DIRECTIONS[RIGHT]
+        elif action == DOWN and direction.y != -1:
+            self.snake.direction = DIRECTIONS[DOWN]
+        elif action == LEFT and direction.x != 1:
+            self.snake.direction = DIRECTIONS[LEFT]
+        return self.snake.direction != direction
+
+    def queue_turn(self, action):
+        """Buffer a turn for the next tick, so two quick presses turn on two ticks instead of reversing"""
+        if len(self.inputs) < MAX_QUEUED_TURNS:
+            self.inputs.append(action)
+
+    def apply_queued_turn(self):
+        # Skip turns that would do nothing or reverse, the next one may still be useful
+        while self.inputs:
+            if self.turn(self.inputs.popleft()):
+                return
+
+    def update(self):
+        self.ticks += 1
+        self.event = NOTHING
+        self.apply_queued_turn()
+        # Direction used this tick, game_over may reset the snake's before the tick ends
+        self.tick_direction = self.snake.direction
+        self.snake.move_snake()
+        self.check_collision()
+        self.check_fail()
+
+    def step(self, action=None):
+        """Apply one action and advance one tick, returns the event that happened"""
+        if action is not None:
+            self.turn(action)
+        self.update()
+        return self.event
+
+    def step_many(self, actions):
+        """Step through a sequence of actions, returns the list of events"""
+        return [self.step(action) for action in actions]
+
+    def check_collision(self):
+        # Off the board the head's cell is None, which nothing is listed under
+        entity = self.entities.get(self.snake.cell(self.snake.body[0]))
+        if entity is None:
+            return
+
+        if entity is self.correct_fruit:
+            self.snake.add_block()
+            self.event = CORRECT
+            self.question.set_status(*STATUS[CORRECT])
+            self.question.new_question()
+            self.new_fruits()
+
+        elif isinstance(entity, OBSTACLE):
+            self.game_over()
+
+        else:
+            game_over = self.snake.remove_block()
+            if game_over:
+                self.game_over()
+            else:
+                self.event = WRONG
+                self.question.set_status(*STATUS[WRONG])
+                self.question.new_question()
+                self.new_fruits()
+
+    def check_fail(self):
+        if self.snake.direction == Vector2(0, 0):
+            return
+
+        if not 0 <= self.snake.body[0].x < self.cell_number or not 0 <= self.snake.body[0].y < self.cell_number:
+            self.game_over()
+
+        if self.snake.hit_self():
+            self.game_over()
+
+    def game_over(self):
+        self.event = GAME_OVER
+        self.snake.reset()
+        self.question.set_status(*STATUS[GAME_OVER])
+
+    def snapshot(self, exact=True):
+        """Pack the game into bytes that restore() can load, see SNAPSHOT_HEADER for the layout.
+
+        The size is 4 bytes per body block plus a fixed header, and in an arena 8
+        more per extra bad fruit and 4 per obstacle. An exact snapshot also holds
+        the rng and the free cell order so the restored game plays on tick for
+        tick the same, which costs 2.5 KB plus 4 bytes per empty cell.
+        """
+        snake, question = self.snake, self.question
+        direction = DIRECTIONS.index(snake.direction) if snake.direction != Vector2(0, 0) else STILL
+        status = next((event for event, (text, _) in STATUS.items() if text == question.status), NOTHING)
+        queued = list(self.inputs) + [0] * (MAX_QUEUED_TURNS - len(self.inputs))
+        correct, bad = self.correct_fruit, self.bad_fruit
+        arena = len(self.bad_fruits) > 1 or bool(self.obstacles)
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_VERSION, snake.new_block | exact << 1 | arena << 2, self.cell_number, self.ticks,
+            direction, self.event, status, len(self.inputs), *queued,
+            question.tier, OPERATOR_CODES[question.op], question.a, question.b,
+            correct.y * self.cell_number + correct.x, correct.answer,
+            bad.y * self.cell_number + bad.x, bad.answer, len(snake.body))
+
+        parts = [header, self.write_cells(int(block.y) * self.cell_number + int(block.x) for block in snake.body)]
+        if arena:
+            others = self.bad_fruits[1:]
+            parts.append(ARENA_COUNTS.pack(len(others), len(self.obstacles)))
+            parts.append(self.write_cells(fruit.cell for fruit in others))
+            parts.append(struct.pack(f'<{len(others)}i', *(fruit.answer for fruit in others)))
+            parts.append(self.write_cells(obstacle.cell for obstacle in self.obstacles))
+        if exact:
+            deck = question.bank.deck(question.tier)
+            parts.append(DECK_STATE.pack(deck.stride, deck.offset, deck.position))
+            _, words, gauss_next = self.rng.getstate()
+            parts.append(RNG_STATE.pack(*words, gauss_next is not None, gauss_next or 0))
+            parts.append(struct.pack('<I', len(self.free_cells)))
+            parts.append(self.write_cells(self.free_cells.cells))
+        return b''.join(parts)
+
+    def restore(self, buf):
+        """Load a snapshot() of a game on a board the same size as this one.
+
+        The body is read straight out of buf through a memoryview. The rng and free
+        cell order are only restored from an exact snapshot. The game has to have
+        as many bad fruits and obstacles as the snapshot's. A RENDERER showing
+        this game needs redraw() afterwards.
+        """
+        view = memoryview(buf).cast('B')
+        fields = SNAPSHOT_HEADER.unpack_from(view)
+        version, flags, cell_number, ticks, direction, event, status, queued = fields[:8]
+        tier, op, a, b, correct_cell, correct_answer, bad_cell, bad_answer, length = fields[8 + MAX_QUEUED_TURNS:]
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {version} can't be loaded, expected {SNAPSHOT_VERSION}")
+        if cell_number != self.cell_number:
+            raise ValueError(f"Snapshot is of a {cell_number}x{cell_number} board, this game is {self.cell_number}x{self.cell_number}")
+
+        offset = SNAPSHOT_HEADER.size
+        cells = self.read_cells(view, offset, length)
+        offset += 4 * length
+        self.snake.restore(cells, DIRECTIONS[direction] if direction != STILL else Vector2(0, 0), bool(flags & 1))
+
+        fruits = [(self.correct_fruit, correct_cell, correct_answer), (self.bad_fruit, bad_cell, bad_answer)]
+        others, obstacles = ARENA_COUNTS.unpack_from(view, offset) if flags & 4 else (0, 0)
+        if others != len(self.bad_fruits) - 1 or obstacles != len(self.obstacles):
+            raise ValueError(f"Snapshot has {others + 1} bad fruits and {obstacles} obstacles, "
+                             f"this game has {len(self.bad_fruits)} and {len(self.obstacles)}")
+        if flags & 4:
+            offset += ARENA_COUNTS.size
+            cells = self.read_cells(view, offset, others)
+            answers = struct.unpack_from(f'<{others}i', view, offset + 4 * others)
+            fruits += zip(self.bad_fruits[1:], cells, answers)
+            offset += 8 * others
+            for obstacle, cell in zip(self.obstacles, self.read_cells(view, offset, obstacles)):
+                obstacle.place(cell % cell_number, cell // cell_number)
+            offset += 4 * obstacles
+
+        for fruit, cell, answer in fruits:
+            fruit.answer = answer
+            fruit.place(cell % cell_number, cell // cell_number)
+
+        self.tier = self.question.tier = tier
+        self.question.set_question(a, b, OPERATOR_SYMBOLS[op])
+        if status == NOTHING:
+            self.question.status = None
+            self.question.status_color = None
+        else:
+            self.question.set_status(*STATUS[status])
+
+        self.ticks = ticks
+        self.event = event
+        self.inputs.clear()
+        self.inputs.extend(fields[8:8 + queued])
+        self.tick_direction = self.snake.direction
+
+        if flags & 2:
+            # The deck has to exist before the rng is set, making it draws from the rng
+            deck = self.question.bank.deck(tier)
+            deck.stride, deck.offset, deck.position = DECK_STATE.unpack_from(view, offset)
+            offset += DECK_STATE.size
+
+            state = RNG_STATE.unpack_from(view, offset)
+            self.rng.setstate((3, state[:625], state[626] if state[625] else None))
+            offset += RNG_STATE.size
+
+            count, = struct.unpack_from('<I', view, offset)
+            free_cells = self.free_cells
+            if count != len(free_cells):
+                raise ValueError("Snapshot's free cells don't match its snake and fruits")
+            free_cells.cells[:] = self.read_cells(view, offset + 4, count)
+            for index, cell in enumerate(free_cells.cells):
+                free_cells.index[cell] = index
+
+    @staticmethod
+    def write_cells(cells):
+        """Flat cells as little endian uint32s"""
+        cells = array('I', cells)
+        if sys.byteorder == 'big':
+            cells.byteswap()
+        return cells
+
+    @staticmethod
+    def read_cells(view, offset, count):
+        """count uint32 cells from view without copying them, unless they need byte swapping"""
+        cells = view[offset:offset + 4 * count].cast('I')
+        if sys.byteorder == 'big':
+            cells = array('I', cells)
+            cells.byteswap()
+        return cells
+
+
+def benchmark(steps=1_000_000, seed=0):
+    """Run random actions through a headless game and return steps per second"""
+    rng = random.Random(seed)
+    actions = [rng.choice((None, None, None, UP, RIGHT, DOWN, LEFT)) for _ in range(steps)]
+    game = MAIN(seed=seed)
+    start = time.perf_counter()
+    game.step_many(actions)
+    return steps / (time.perf_counter() - start)
+
+
+def benchmark_snapshots(lengths=(3, 100, 1000, 10000), repeats=1000):
+    """Snapshot size and snapshot/restore rates for snakes of each length, on a board twice their size"""
+    for length in lengths:
+        cell_number = max(CELL_NUMBER, math.isqrt(2 * length) + 1)
+        game = MAIN(cell_number, seed=0)
+        # Zigzag body from the top left corner, head first
+        cells = [i // cell_number * cell_number + (i % cell_number if i // cell_number % 2 == 0 else cell_number - 1 - i % cell_number)
+                 for i in range(length)][::-1]
+        game.snake.restore(cells, DIRECTIONS[RIGHT], False)
+        other = MAIN(cell_number, seed=1)
+
+        for exact in (False, True):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                buf = game.snapshot(exact)
+            snapshot_rate = repeats / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                other.restore(buf)
+            restore_rate = repeats / (time.perf_counter() - start)
+
+            print(f"length {length:>6} board {cell_number:>3}x{cell_number:<3} {'exact' if exact else 'basic'}: {len(buf):>7,} bytes, "
+                  f"{snapshot_rate:>9,.0f} snapshots/sec, {restore_rate:>9,.0f} restores/sec")
+
+
+def benchmark_arena(counts=(1, 10, 100, 500, 1000), cell_number=100, steps=100_000, repeats=100_000):
+    """Head collision checks by entity lookup against comparing the head to every entity, and
+    steps per second, with count bad fruits and count obstacles on the board"""
+    for count in counts:
+        game = MAIN(cell_number, seed=0, distractors=count, obstacles=count)
+        head = game.snake.body[0]
+        entities = list(game.entities.values())
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            game.entities.get(game.snake.cell(head))
+        lookup = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for entity in entities:
+                if head == entity.pos:
+                    break
+        scan = (time.perf_counter() - start) / repeats
+
+        rng = random.Random(0)
+        actions = [rng.choice((None, None, None, UP, RIGHT, DOWN, LEFT)) for _ in range(steps)]
+        start = time.perf_counter()
+        game.step_many(actions)
+        rate = steps / (time.perf_counter() - start)
+        print(f"{len(entities):>5} entities: lookup {lookup * 1e6:6.2f} us, comparing each {scan * 1e6:8.2f} us, "
+              f"{rate:>9,.0f} steps/sec")
+
+
+if __name__ == '__main__':
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{benchmark(steps):,.0f} steps/sec over {steps:,} steps")
+    benchmark_snapshots()
+    benchmark_arena()
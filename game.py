@@ -1,20 +1,31 @@
 import pygame, sys, random
-from pygame.math import Vector2
+from collections import deque
+import engine
+from renderer import RENDERER
+from text_cache import TEXT_CACHE
+from sprite_atlas import load_atlas
+from camera import CAMERA
+from ticker import TICKER
+from replay import RECORDER
+from profiler import PROFILER, OVERLAY
+from autopilot import AUTOPILOT
+from stats_store import STATS_STORE
 
 
 def load_resize_sprite(name):
-    path = f'extracted_sprites/{name}'
-    return pygame.transform.scale(pygame.image.load(path).convert_alpha(), (cell_size, cell_size))
+    # Cut from the shared spritesheet atlas, scaled once per cell_size
+    return load_atlas(cell_size).get(name)
 
-def get_random_number():
-    return random.randint(1, 10)
+class SNAKE(engine.SNAKE):
+    """engine.SNAKE with a sprite and world rect kept for every block.
 
-class SNAKE:
-    def __init__(self):
-        self.body = [Vector2(5,10),Vector2(4,10), Vector2(3,10)]
-        self.direction = Vector2(0,0)
-        self.new_block = False
+    tiles runs alongside body, head first. A move only changes the tiles of
+    the new head, the old head and the tail, so add_head and drop_tail fix up
+    just those and draw_snake is a single blits call rather than working out
+    every block's sprite each frame.
+    """
 
+    def __init__(self, cell_number=engine.CELL_NUMBER, free_cells=None):
         self.head_up = load_resize_sprite('head_up.png')
         self.head_down = load_resize_sprite('head_down.png')
         self.head_right = load_resize_sprite('head_right.png')
@@ -33,130 +44,105 @@ class SNAKE:
         self.body_bl = load_resize_sprite('bl.png')
         self.body_br = load_resize_sprite('br.png')
 
+        # Keyed by the block next to the head or tail minus the head or tail
+        self.heads = {(1, 0): self.head_left, (-1, 0): self.head_right, (0, 1): self.head_up, (0, -1): self.head_down}
+        self.tails = {(1, 0): self.tail_left, (-1, 0): self.tail_right, (0, 1): self.tail_up, (0, -1): self.tail_down}
+        # Drawn for a block whose neighbours don't fit any sprite, which a real game never has
+        self.blank = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+
+        # (sprite, world rect) for every block, filled in by reset
+        self.tiles = deque()
+        super().__init__(cell_number, free_cells)
+
+    def tile(self, body, index):
+        """(sprite, world rect) for body[index], from the blocks either side of it"""
+        block = body[index]
+        rect = pygame.Rect(int(block.x) * cell_size, int(block.y) * cell_size, cell_size, cell_size)
+        if index == 0:
+            relation = body[1] - block
+            return self.heads.get((relation.x, relation.y), self.blank), rect
+        if index == len(body) - 1:
+            relation = body[index - 1] - block
+            return self.tails.get((relation.x, relation.y), self.blank), rect
+
+        previous_block = body[index + 1] - block
+        next_block = body[index - 1] - block
+        if previous_block.x == next_block.x:
+            return self.body_vertical, rect
+        elif previous_block.y == next_block.y:
+            return self.body_horizontal, rect
+        else:
+            if previous_block.x == -1 and next_block.y == -1 or previous_block.y == -1 and next_block.x == -1:
+                return self.body_br, rect
+            elif previous_block.x == -1 and next_block.y == 1 or previous_block.y == 1 and next_block.x == -1:
+                return self.body_tr, rect
+            elif previous_block.x == 1 and next_block.y == -1 or previous_block.y == -1 and next_block.x == 1:
+                return self.body_bl, rect
+            elif previous_block.x == 1 and next_block.y == 1 or previous_block.y == 1 and next_block.x == 1:
+                return self.body_tl, rect
+        return self.blank, rect
+
+    def retile(self):
+        """Work out every block's tile again, after the body was replaced"""
+        body = list(self.body)
+        self.tiles = deque(self.tile(body, index) for index in range(len(body)))
+
+    def add_head(self, pos):
+        super().add_head(pos)
+        # The new head, and the old head that is now part of the body
+        self.tiles.appendleft(self.tile(self.body, 0))
+        if len(self.body) > 1:
+            self.tiles[1] = self.tile(self.body, 1)
+
+    def drop_tail(self):
+        super().drop_tail()
+        self.tiles.pop()
+        if len(self.body) > 1:
+            # The block that is the tail now
+            self.tiles[-1] = self.tile(self.body, len(self.body) - 1)
+
+    def restore(self, cells, direction, new_block):
+        super().restore(cells, direction, new_block)
+        self.retile()
+
+    def reset(self):
+        super().reset()
+        self.retile()
+
     def draw_snake(self):
-        self.update_head_graphics()
-        self.update_tail_graphics()
-
-        for index, block in enumerate(self.body):
-            x_pos = block.x * cell_size
-            y_pos = block.y * cell_size
-            block_rect = pygame.Rect(x_pos, y_pos, cell_size, cell_size)
-
-            if index == 0:
-                screen.blit(self.head, block_rect)
-            elif index == len(self.body) - 1:
-                screen.blit(self.tail, block_rect)
-            else:
-                previous_block = self.body[index + 1] - block
-                next_block = self.body[index -1] - block
-                if previous_block.x == next_block.x:
-                    screen.blit(self.body_vertical, block_rect)
-                elif previous_block.y == next_block.y:
-                    screen.blit(self.body_horizontal, block_rect)
-                else:
-                    if previous_block.x == -1 and next_block.y == -1 or previous_block.y == -1 and next_block.x == -1:
-                        screen.blit(self.body_br, block_rect)
-                    elif previous_block.x == -1 and next_block.y == 1 or previous_block.y == 1 and next_block.x == -1:
-                        screen.blit(self.body_tr, block_rect)
-                    elif previous_block.x == 1 and next_block.y == -1 or previous_block.y == -1 and next_block.x == 1:
-                        screen.blit(self.body_bl, block_rect)
-                    elif previous_block.x == 1 and next_block.y == 1 or previous_block.y == 1 and next_block.x == 1:
-                        screen.blit(self.body_tl, block_rect)
-
-
-    def update_tail_graphics(self):
-        tail_relation = self.body[-2] - self.body[-1]
-        if   tail_relation == Vector2(1,0): self.tail = self.tail_left
-        elif tail_relation == Vector2(-1, 0): self.tail = self.tail_right
-        elif tail_relation == Vector2(0, 1): self.tail = self.tail_up
-        elif tail_relation == Vector2(0, -1): self.tail = self.tail_down
-
-    def update_head_graphics(self):
-        head_relation = self.body[1] - self.body[0]
-        if   head_relation == Vector2(1,0): self.head = self.head_left
-        elif head_relation == Vector2(-1, 0): self.head = self.head_right
-        elif head_relation == Vector2(0, 1): self.head = self.head_up
-        elif head_relation == Vector2(0, -1): self.head = self.head_down
-
-
-    def move_snake(self):
-        if self.direction == Vector2(0,0):
+        if camera.view_cells == camera.cell_number:
+            # The whole board is in view, world rects are screen rects
+            screen.blits(self.tiles, doreturn=False)
             return
+        view = pygame.Rect(camera.x * cell_size, camera.y * cell_size, camera.view_cells * cell_size, camera.view_cells * cell_size)
+        offset = (-view.x, -view.y)
+        screen.blits([(sprite, rect.move(offset)) for sprite, rect in self.tiles if view.contains(rect)], doreturn=False)
 
-        if self.new_block:
-            # Create copy of snake including last index
-            body_copy = self.body[:]
-            # insert new at 0 and apply direction
-            body_copy.insert(0, body_copy[0] + self.direction)
-            # Copy whole thing back to body copy
-            self.body = body_copy[:]
-            # revert flag back to false so that snake doesnt keep extending
-            self.new_block = False
-        else:
-            # Create copy of snake leaving out last index
-            body_copy = self.body[:-1]
-            # insert new at 0 and apply direction
-            body_copy.insert(0, body_copy[0] + self.direction)
-            # Copy whole thing back to body copy
-            self.body = body_copy[:]
-
-    def add_block(self):
-        self.new_block = True
-
-    def remove_block(self):
-        if len(self.body) > 3:
-            self.body.pop()
-            return False
-        else:
-            return True
+    def segment_sprites(self):
+        """Pairs of (block, sprite) for every block of the snake, head first"""
+        return [(block, sprite) for block, (sprite, rect) in zip(self.body, self.tiles)]
 
-    def reset(self):
-        self.body = [Vector2(5, 10), Vector2(4, 10), Vector2(3, 10)]
-        self.direction = Vector2(0, 0)
-
-class FRUIT:
-    def __init__(self, answer):
-        self.pos = pygame.math.Vector2(random.randint(0, cell_number - 1), random.randint(0, cell_number - 1))
-        self.answer = answer
-        self.randomize()
-
-    def draw_fruit(self):
-        game_font_small = pygame.font.Font(None, 25)
-        fruit_rect = pygame.Rect(self.pos.x * cell_size, self.pos.y * cell_size, cell_size, cell_size)
+
+class FRUIT(engine.FRUIT):
+    def blits(self, fruit_rect):
+        """(surface, rect) pairs that draw the fruit in fruit_rect"""
         # pygame.draw.rect(screen, (126, 166, 114), fruit_rect)
-        screen.blit(apple, fruit_rect)
-        number_surface = game_font_small.render(str(self.answer), True, (255, 255, 255))
+        number_surface = text_cache.render(str(self.answer), 25, (255, 255, 255), game_font)
         number_rect = number_surface.get_rect(center=fruit_rect.center)
         number_rect.y += 5
-        screen.blit(number_surface, number_rect)
-
-
-
-    def randomize(self):
-        self.x = random.randint(0, cell_number -1)
-        self.y = random.randint(0, cell_number -1)
-        self.pos = Vector2(self.x, self.y)
+        return [(apple, fruit_rect), (number_surface, number_rect)]
 
-class QUESTIONS:
-    def __init__(self):
-        self.status = None
-        self.status_color = None
-        self.status_timer = 0
-        self.new_question()
+class OBSTACLE(engine.OBSTACLE):
+    def blits(self, rect):
+        return [(rock, rect)]
 
+class QUESTIONS(engine.QUESTIONS):
     def set_status(self, text, color):
-        self.status = text
-        self.status_color = color
+        super().set_status(text, color)
         self.status_timer = pygame.time.get_ticks()
 
-    def new_question(self):
-        self.a = get_random_number()
-        self.b = get_random_number()
-        self.text = f"{self.a} + {self.b} = ?"
-        self.answer = self.a + self.b
-
     def draw_question(self):
-        question_surface = game_font.render(self.text, True, (255, 255, 255))
+        question_surface = text_cache.render(self.text, 32, (255, 255, 255), game_font)
         question_x = window_width - 725
         question_y = 850
         question_rect = question_surface.get_rect(center=(question_x, question_y))
@@ -165,17 +151,21 @@ class QUESTIONS:
         pygame.draw.rect(window, (0, 0, 0), bg_rect)
         pygame.draw.rect(window, (255, 255, 255), bg_rect, 2)
         window.blit(question_surface, question_rect)
+        return bg_rect
 
-    def draw_status(self):
+    def update_status(self):
+        """Clear the status once it has been shown for 1.5 seconds, returns True if it was cleared"""
         if self.status and pygame.time.get_ticks() - self.status_timer > 1500:
             self.status = None
             self.status_color = None
-            return
+            return True
+        return False
 
-        if not self.status:
-            return
+    def draw_status(self):
+        if self.update_status() or not self.status:
+            return None
 
-        status_surface = game_font.render(self.status, True, self.status_color)
+        status_surface = text_cache.render(self.status, 32, self.status_color, game_font)
         status_x = window_width - 400
         status_y = 850
         status_rect = status_surface.get_rect(center=(status_x, status_y))
@@ -183,178 +173,239 @@ class QUESTIONS:
         pygame.draw.rect(window, (0, 0, 0), bg_rect)
         pygame.draw.rect(window, (255, 255, 255), bg_rect, 2)
         window.blit(status_surface, status_rect)
+        return bg_rect
 
 
-class MAIN:
-    def __init__(self):
-        self.snake = SNAKE()
-        self.question = QUESTIONS()
-        self.correct_fruit = FRUIT(self.question.answer)
-
-        wrong_answer = self.question.answer
-        while wrong_answer == self.question.answer:
-            wrong_answer = random.randint(2, 20)
-        self.bad_fruit = FRUIT(wrong_answer)
-
-    def update(self):
-        self.snake.move_snake()
-        self.check_collision()
-        self.check_fail()
+class MAIN(engine.MAIN):
+    snake_class = SNAKE
+    fruit_class = FRUIT
+    obstacle_class = OBSTACLE
+    question_class = QUESTIONS
 
     def draw_elements(self):
+        camera.follow(self.snake.body[0])
         self.draw_grass()
         self.snake.draw_snake()
-        self.correct_fruit.draw_fruit()
-        self.bad_fruit.draw_fruit()
+        self.draw_entities()
         self.draw_score()
         self.question.draw_question()
         self.question.draw_status()
 
     def check_collision(self):
-        head = self.snake.body[0]
-
-        if head == self.correct_fruit.pos:
-            self.snake.add_block()
-            self.question.set_status("Correct! +1 Length", (0, 255, 0))
-            self.question.new_question()
-
-            self.correct_fruit = FRUIT(self.question.answer)
-            wrong_answer = self.question.answer
-            while wrong_answer == self.question.answer:
-                wrong_answer = random.randint(2, 20)
-            self.bad_fruit = FRUIT(wrong_answer)
-
-        elif head == self.bad_fruit.pos:
-            game_over = self.snake.remove_block()
-            if game_over:
-                self.game_over()
-            else:
-                self.question.set_status("Wrong! -1 Length", (255, 0, 0))
-                self.question.new_question()
-                self.correct_fruit = FRUIT(self.question.answer)
-                wrong_answer = self.question.answer
-                while wrong_answer == self.question.answer:
-                    wrong_answer = random.randint(2, 20)
-                self.bad_fruit = FRUIT(wrong_answer)
-
-
-    def check_fail(self):
-        if self.snake.direction == Vector2(0, 0):
-            return
-
-        if not 0 <= self.snake.body[0].x < cell_number or not 0 <= self.snake.body[0].y < cell_number:
-            self.game_over()
-
-        for block in self.snake.body[1:]:
-            if block == self.snake.body[0]:
-                self.game_over()
+        if stats is not None:
+            # Recorded before the question changes
+            fruit = self.entities.get(self.snake.cell(self.snake.body[0]))
+            if isinstance(fruit, engine.FRUIT):
+                stats.answer(self, fruit)
+        super().check_collision()
 
     def game_over(self):
-        self.snake.reset()
-        self.question.set_status("Game Over!", (255, 165, 0))
-
-    def draw_grass(self):
+        if stats is not None:
+            stats.end_game(self)
+        super().game_over()
+        if stats is not None:
+            stats.start_game(self)
+
+    def draw_entities(self, surface=None):
+        """Every fruit and obstacle in view, in one blits call"""
+        if surface is None:
+            surface = screen
+        sequence = []
+        for entity in self.entities.values():
+            rect = camera.cell_rect(entity.pos, cell_size)
+            if rect is not None:
+                sequence += entity.blits(rect)
+        surface.blits(sequence, doreturn=False)
+
+    def draw_grass(self, surface=None, view=None):
+        if surface is None:
+            surface = screen
+        # Only the cells in view, the pattern follows world cells so it scrolls with the camera
+        if view is None:
+            view = camera
         grass_color = (155, 195, 50)
-        for row in range(cell_number):
-            if row % 2 == 0:
-                for col in range(cell_number):
-                    if col % 2 == 0:
+        for row in range(view.view_cells):
+            if (view.y + row) % 2 == 0:
+                for col in range(view.view_cells):
+                    if (view.x + col) % 2 == 0:
                             grass_rect = pygame.Rect(col * cell_size, row * cell_size, cell_size, cell_size)
-                            pygame.draw.rect(screen, grass_color, grass_rect)
+                            pygame.draw.rect(surface, grass_color, grass_rect)
     def draw_score(self):
-        score_text = str(len(self.snake.body) - 3)
-        score_surface = game_font.render(score_text, True, (255,255,255))
+        score = len(self.snake.body) - 3
+        score_text = str(score)
+        if stats is not None:
+            # The best score from earlier sessions too
+            score_text += f" / {max(score, stats.best)}"
+        score_surface = text_cache.render(score_text, 32, (255,255,255), game_font)
         score_x = window_width - 60
         score_y = 850
         score_rect = score_surface.get_rect(center = (score_x, score_y))
         apple_rect = apple.get_rect(midright = (score_rect.left, score_rect.centery))
-        bg_rect = pygame.Rect(apple_rect.left, apple_rect.top, apple_rect.width + apple_rect.width, apple_rect.height)
+        bg_width = max(apple_rect.width, score_rect.width + 5)
+        bg_rect = pygame.Rect(apple_rect.left, apple_rect.top, apple_rect.width + bg_width, apple_rect.height)
 
         pygame.draw.rect(window, (0,0,0), bg_rect)
         pygame.draw.rect(window, (255,255,255), bg_rect, 2)
         # screen.blit(score_surface, score_rect)
         window.blit(apple, apple_rect)
         window.blit(score_surface, score_rect)
+        return bg_rect
 
 
 
 
-# Initialise pygame
-pygame.init()
-cell_size = 40
-cell_number = 20
-paused = False
-
-#  Set the window size (900 * 800
-window_width, window_height = 800, 900
-window = pygame.display.set_mode((window_width, window_height))
-# Set the screen size (this would be: 800 * 800)
-screen = pygame.Surface((cell_size * cell_number, cell_size * cell_number))
-
-
-# New clock object for limiting fps
-clock = pygame.time.Clock()
-# .convert_alpha() converts image to something pygame works with more easily.
-apple = pygame.image.load('Graphics/apple1.png').convert_alpha()
-apple = pygame.transform.scale(apple, (cell_size, cell_size))
-# Can add font by importing a ttf file instead of None, it is as a string
-game_font = pygame.font.Font(None, 32)
-
-
-# Creating an event to update the screen
-SCREEN_UPDATE = pygame.USEREVENT
-#  Triggering that event to happen every 150ms
-pygame.time.set_timer(SCREEN_UPDATE, 150)
-
-main_game = MAIN()
-
-while True:
-    # Check for quit pressed
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            sys.exit()
-        # Listening for the screen update during the event loop.
-        if event.type == SCREEN_UPDATE and not paused:
-            main_game.update()
+def init_display(world_size=engine.CELL_NUMBER):
+    """Open the window and set up the camera, surfaces and sprites the draw methods use"""
+    global cell_number, camera, window, screen, apple, rock
+    cell_number = world_size
+    camera = CAMERA(cell_number, view_cells)
 
-        # Listen for keys pressed and adjust directions accordingly
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP:
-                if main_game.snake.direction.y != 1:
-                    main_game.snake.direction = Vector2(0, -1)
+    window = pygame.display.set_mode((window_width, window_height))
+    # Set the screen size to the part of the board in view (this would be: 800 * 800)
+    screen = pygame.Surface((cell_size * camera.view_cells, cell_size * camera.view_cells))
 
+    # Uses the atlas when sprite_data.json has an 'apple1' entry, otherwise loads the png
+    apple = load_atlas(cell_size).get('apple1', 'Graphics/apple1.png')
+    # There is no obstacle sprite, a dark stone is drawn once here
+    rock = pygame.Surface((cell_size, cell_size), pygame.SRCALPHA)
+    pygame.draw.rect(rock, (90, 90, 90), rock.get_rect().inflate(-4, -4), border_radius=8)
+    pygame.draw.rect(rock, (50, 50, 50), rock.get_rect().inflate(-4, -4), 3, border_radius=8)
 
-            if event.key == pygame.K_RIGHT:
-                if main_game.snake.direction.x != -1:
-                    main_game.snake.direction = Vector2(1, 0)
 
+def quit_game():
+    print(renderer.report())
+    print(text_cache.report())
+    print(ticker.report())
+    recorder.replay.save(replay_file)
+    print(f"Replay of {len(recorder.replay)} ticks saved to '{replay_file}'")
+    if autopilot.ticks:
+        print(autopilot.report())
+    if profiler.timings:
+        profiler.export(profile_file)
+        print(f"Frame timings saved to '{profile_file}.csv' and '{profile_file}.json'")
+    # The game being played counts too, it just didn't end in a death
+    stats.end_game(main_game, died=False)
+    stats.close()
+    print(stats.report())
+    pygame.quit()
+    sys.exit()
 
-            if event.key == pygame.K_DOWN:
-                if main_game.snake.direction.y != -1:
-                    main_game.snake.direction = Vector2(0, 1)
 
+cell_size = 40
+cell_number = engine.CELL_NUMBER
+# Boards bigger than this scroll with the snake's head
+view_cells = 20
+# Game speed, and how many missed ticks are made up at once after a stall
+tick_ms = 150
+max_catch_up = 5
+# Every session is saved here on exit, play it back with python replay.py last_replay.bin
+replay_file = 'last_replay.bin'
+# F3 shows frame timings, they are saved here on exit if it was ever turned on
+profile_file = 'profile'
+# Every game, answer and reaction time is kept here, see python stats_store.py for the report
+stats_file = 'stats.db'
+camera = CAMERA(cell_number, view_cells)
 
-            if event.key == pygame.K_LEFT:
-                if main_game.snake.direction.x != 1:
-                        main_game.snake.direction = Vector2(-1, 0)
-
-            if event.key == pygame.K_ESCAPE:
-                pygame.quit()
-                sys.exit()
-
-            if event.key == pygame.K_SPACE:
-                paused = not paused
-
-
-    window.fill((30,30,30))
-    window.blit(screen, (0,0))
-    # Change color of surface
-    screen.fill((175, 215, 70))
-
-    main_game.draw_elements()
-
-    pygame.display.update()
-    # Limit fps to 60fps
-    clock.tick(60)
+#  Set the window size (900 * 800
+window_width, window_height = 800, 900
 
+# Can add font by importing a ttf file instead of None, it is as a string
+game_font = None
+# Fonts are loaded once and rendered text is reused until it changes
+text_cache = TEXT_CACHE()
+# Times every phase of the frame and the draw methods, costs nothing until F3 turns it on
+profiler = PROFILER()
+# Set when the game is run, the headless tools and benchmarks draw without recording anything
+stats = None
+profiler.instrument(engine.MAIN, 'update')
+profiler.instrument(MAIN, 'draw_grass', 'draw_entities', 'draw_score')
+profiler.instrument(SNAKE, 'segment_sprites', 'draw_snake')
+profiler.instrument(QUESTIONS, 'draw_question', 'draw_status')
+profiler.instrument(RENDERER, 'draw_board', 'draw_hud')
+
+
+if __name__ == '__main__':
+    # Initialise pygame
+    pygame.init()
+    paused = False
+    # Board size in cells, question tier, bad fruits, obstacles and player name can be passed on the command
+    # line, e.g. python game.py 1000 3 for a big board or python game.py 100 1 50 200 ben for an arena
+    init_display(int(sys.argv[1]) if len(sys.argv) > 1 else engine.CELL_NUMBER)
+    tier = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    distractors = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    obstacles = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    # Whose games these are on the leaderboard
+    player = sys.argv[5] if len(sys.argv) > 5 else 'player'
+
+    # New clock object for limiting fps
+    clock = pygame.time.Clock()
+    # Game updates every tick_ms on a fixed timestep, separately from drawing
+    ticker = TICKER(tick_ms, max_catch_up)
+
+    main_game = MAIN(cell_number, seed=random.randrange(2 ** 64), tier=tier, distractors=distractors, obstacles=obstacles)
+    recorder = RECORDER(main_game)
+    stats = STATS_STORE(stats_file, player, tick_ms)
+    stats.start_game(main_game)
+    # Only redraws what changed, draw_elements still repaints everything if needed
+    renderer = RENDERER(window, main_game, cell_size, camera)
+    overlay = OVERLAY(profiler, game_font)
+    # A steers to the right answer by itself
+    autopilot = AUTOPILOT(main_game)
+    autopiloting = False
+
+    while True:
+        profiler.frame()
+        # Check for quit pressed
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game()
+            # Listen for keys pressed and queue the turns, one is applied per tick
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_UP:
+                    main_game.queue_turn(engine.UP)
+
+                if event.key == pygame.K_RIGHT:
+                    main_game.queue_turn(engine.RIGHT)
+
+                if event.key == pygame.K_DOWN:
+                    main_game.queue_turn(engine.DOWN)
+
+                if event.key == pygame.K_LEFT:
+                    main_game.queue_turn(engine.LEFT)
+
+                if event.key == pygame.K_ESCAPE:
+                    quit_game()
+
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+
+                if event.key == pygame.K_a:
+                    autopiloting = not autopiloting
+
+                if event.key == pygame.K_F3:
+                    # Hiding the overlay needs the board underneath it back
+                    if not profiler.toggle():
+                        renderer.redraw()
+        profiler.lap('events')
+
+        # Run however many ticks are due, paused time doesn't count
+        if paused:
+            ticker.reset()
+        else:
+            for _ in range(ticker.advance()):
+                if autopiloting:
+                    action = autopilot.act()
+                    if action is not None:
+                        main_game.queue_turn(action)
+                recorder.update()
+        profiler.lap('update')
+
+        dirty = renderer.draw()
+        profiler.lap('draw')
+        if profiler.enabled:
+            dirty += overlay.draw(window)
+        pygame.display.update(dirty)
+        profiler.lap('display')
+        # Limit fps to 60fps
+        clock.tick(60)
+        profiler.lap('wait')
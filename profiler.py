@@ -0,0 +1,174 @@
+import csv, json, time
+from collections import deque
+from functools import wraps
+import pygame
+
+
+class PROFILER:
+    """Times each phase of a frame and any instrumented draw_* methods.
+
+    The main loop calls frame() at the top of every frame and lap(name) after
+    each phase, so a phase is the time since the previous lap. instrument()
+    swaps a class's method for a timed wrapper, and only while enabled, so when
+    the profiler is off the methods are the originals and lap() returns at once.
+    The last samples timings of every name are kept for p50/p95/p99.
+    """
+
+    def __init__(self, samples=600, clock=time.perf_counter):
+        self.clock = clock
+        self.samples = samples
+        self.enabled = False
+        # name -> recent timings in seconds, oldest first
+        self.timings = {}
+        self.targets = []
+        self.originals = {}
+        self.frame_start = None
+        self.last = None
+
+    def add(self, name, seconds):
+        if name not in self.timings:
+            self.timings[name] = deque(maxlen=self.samples)
+        self.timings[name].append(seconds)
+
+    def frame(self):
+        """Start a new frame, the time since the last one is the frame time"""
+        if not self.enabled:
+            return
+        now = self.clock()
+        if self.frame_start is not None:
+            self.add('frame', now - self.frame_start)
+        self.frame_start = self.last = now
+
+    def lap(self, name):
+        """Time since the previous lap or frame start counts towards name"""
+        if not self.enabled:
+            return
+        now = self.clock()
+        if self.last is not None:
+            self.add(name, now - self.last)
+        self.last = now
+
+    def timed(self, name, function):
+        """function wrapped to record how long each call takes under name"""
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = self.clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, self.clock() - start)
+        return wrapper
+
+    def instrument(self, owner, *names):
+        """Time these methods of owner (usually a class) while the profiler is enabled"""
+        for name in names:
+            self.targets.append((owner, name))
+            if self.enabled:
+                self.wrap(owner, name)
+
+    def wrap(self, owner, name):
+        original = owner.__dict__[name]
+        self.originals[owner, name] = original
+        setattr(owner, name, self.timed(f"{getattr(owner, '__name__', owner)}.{name}", original))
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.frame_start = self.last = None
+        for owner, name in self.targets:
+            self.wrap(owner, name)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for (owner, name), original in self.originals.items():
+            setattr(owner, name, original)
+        self.originals.clear()
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+        return self.enabled
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        """Nearest-rank percentiles of the recent timings of name, in seconds"""
+        ordered = sorted(self.timings.get(name, ()))
+        if not ordered:
+            return [0] * len(points)
+        return [ordered[min(len(ordered) - 1, max(0, -(-point * len(ordered) // 100) - 1))] for point in points]
+
+    def summary(self):
+        """Row per name: count, mean, p50, p95, p99 and max in ms"""
+        rows = []
+        for name, timings in self.timings.items():
+            p50, p95, p99 = self.percentiles(name)
+            rows.append({'name': name, 'count': len(timings), 'mean_ms': sum(timings) / len(timings) * 1000,
+                         'p50_ms': p50 * 1000, 'p95_ms': p95 * 1000, 'p99_ms': p99 * 1000,
+                         'max_ms': max(timings) * 1000})
+        return rows
+
+    def export(self, base):
+        """Write base.csv with the summary and base.json with the summary plus the raw timings in ms"""
+        rows = self.summary()
+        with open(f'{base}.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['name', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            writer.writeheader()
+            writer.writerows(rows)
+        with open(f'{base}.json', 'w') as f:
+            json.dump({'summary': rows,
+                       'timings_ms': {name: [t * 1000 for t in timings] for name, timings in self.timings.items()}},
+                      f, indent=1)
+
+
+class OVERLAY:
+    """Box in the top left of the window with the profiler's p50/p95/p99 for every name.
+
+    The text is only re-rendered every refresh_ms, in between the same surface
+    is blitted, so the overlay itself barely shows up in the timings.
+    """
+
+    def __init__(self, profiler, font=None, size=18, refresh_ms=250, position=(10, 10)):
+        self.profiler = profiler
+        self.font = pygame.font.Font(font, size)
+        self.refresh = refresh_ms / 1000
+        self.position = position
+        self.surface = None
+        self.rendered = None
+        # The box only ever grows, so a new one always covers the last
+        self.size = (0, 0)
+
+    def render(self):
+        rows = [('ms', 'p50', 'p95', 'p99')]
+        rows += [(row['name'], f"{row['p50_ms']:.2f}", f"{row['p95_ms']:.2f}", f"{row['p99_ms']:.2f}")
+                 for row in self.profiler.summary()]
+        rows = [[self.font.render(text, True, (255, 255, 255)) for text in row] for row in rows]
+
+        # The font isn't monospaced, so the name column is left aligned and the numbers right aligned in columns
+        name_width = max(row[0].get_width() for row in rows)
+        number_width = max(self.font.size('000.00')[0], *(s.get_width() for row in rows for s in row[1:]))
+        line_height = self.font.get_linesize()
+        self.size = (max(self.size[0], name_width + 3 * (number_width + 12) + 12),
+                     max(self.size[1], len(rows) * line_height + 12))
+
+        surface = pygame.Surface(self.size)
+        surface.fill((0, 0, 0))
+        pygame.draw.rect(surface, (255, 255, 255), surface.get_rect(), 1)
+        for index, (name, *numbers) in enumerate(rows):
+            y = 6 + index * line_height
+            surface.blit(name, (6, y))
+            for column, number in enumerate(numbers):
+                right = 6 + name_width + (column + 1) * (number_width + 12)
+                surface.blit(number, (right - number.get_width(), y))
+        return surface
+
+    def draw(self, window):
+        """Draw onto window, returns the rects that need updating"""
+        now = self.profiler.clock()
+        if self.surface is None or now - self.rendered >= self.refresh:
+            self.surface = self.render()
+            self.rendered = now
+        return [window.blit(self.surface, self.position)]
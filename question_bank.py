@@ -0,0 +1,248 @@
+import math, mmap, os, random, struct, sys, time
+from array import array
+from operator import add, sub, mul, floordiv
+
+OPERATORS = {'+': add, '-': sub, '×': mul, '÷': floordiv}
+# Stable codes for each operator, for snapshots and BATCH
+OPERATOR_SYMBOLS = tuple(OPERATORS)
+OPERATOR_CODES = {op: code for code, op in enumerate(OPERATOR_SYMBOLS)}
+
+# Operators and the range of both numbers for each tier. Subtraction never goes
+# below zero and division always comes out exact. Tier 1 is the original game.
+TIERS = {
+    1: ('+', 1, 10),
+    2: ('+-', 1, 20),
+    3: ('+-×', 1, 12),
+    4: ('+-×÷', 1, 12),
+}
+
+# Curriculum index: answer range then one byte offset per question, all uint64
+INDEX_HEADER = struct.Struct('<qq')
+
+
+def answer(a, op, b):
+    return OPERATORS[op](a, b)
+
+
+def generate(tier):
+    """Every question in a tier as (a, op, b) tuples"""
+    ops, low, high = TIERS[tier]
+    questions = []
+    for op in ops:
+        for a in range(low, high + 1):
+            for b in range(low, high + 1):
+                if op == '-' and a < b:
+                    continue
+                # Division is multiplication backwards, a x b ÷ b = a
+                questions.append((a * b, op, b) if op == '÷' else (a, op, b))
+    return questions
+
+
+def parse(line):
+    """'a op b' as (a, op, b)"""
+    a, op, b = line.split()
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator {op!r} in {line!r}")
+    return int(a), op, int(b)
+
+
+class POOL:
+    """Questions held in memory, with the lowest and highest answer for picking distractors.
+
+    Generated tiers are shuffled once with a fixed seed, so a deck walking them
+    with a stride doesn't deal them in the order they were generated.
+    """
+
+    def __init__(self, questions, shuffle_seed=None):
+        self.questions = list(questions)
+        if not self.questions:
+            raise ValueError("A question pool can't be empty")
+        if shuffle_seed is not None:
+            random.Random(shuffle_seed).shuffle(self.questions)
+        answers = [answer(*question) for question in self.questions]
+        self.low = min(answers)
+        self.high = max(answers)
+
+    @classmethod
+    def tier(cls, tier):
+        return cls(generate(tier), shuffle_seed=tier)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, index):
+        return self.questions[index]
+
+
+class CURRICULUM:
+    """Questions read from a text file, one 'a op b' per line, only when they are dealt.
+
+    The byte offset of every line is kept in an index file next to it
+    (path + '.idx'), built the first time the curriculum is opened and rebuilt
+    whenever the file is newer. The index is memory mapped, so neither the
+    questions nor their offsets are held in memory however long the file is.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + '.idx'
+        if not os.path.exists(self.index_path) or os.path.getmtime(self.index_path) < os.path.getmtime(path):
+            self.build_index()
+
+        self.file = open(path, 'rb')
+        with open(self.index_path, 'rb') as f:
+            self.index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.low, self.high = INDEX_HEADER.unpack_from(self.index_map)
+        self.offsets = memoryview(self.index_map)[INDEX_HEADER.size:].cast('Q')
+        if not len(self.offsets):
+            self.close()
+            raise ValueError(f"{path} has no questions")
+
+    def build_index(self):
+        """One pass over the file, writing offsets as it goes"""
+        low, high = sys.maxsize, -sys.maxsize
+        with open(self.path, 'rb') as f, open(self.index_path, 'wb') as index:
+            index.write(INDEX_HEADER.pack(0, 0))
+            offsets = array('Q')
+            offset = 0
+            for line in f:
+                if line.strip() and not line.startswith(b'#'):
+                    value = answer(*parse(line.decode()))
+                    low, high = min(low, value), max(high, value)
+                    offsets.append(offset)
+                    # Flush in chunks so the offsets never pile up in memory either
+                    if len(offsets) >= 65536:
+                        offsets.tofile(index)
+                        del offsets[:]
+                offset += len(line)
+            offsets.tofile(index)
+            index.seek(0)
+            index.write(INDEX_HEADER.pack(low, high))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        self.file.seek(self.offsets[index])
+        return parse(self.file.readline().decode())
+
+    def close(self):
+        self.offsets.release()
+        self.index_map.close()
+        self.file.close()
+
+
+class DECK:
+    """Deals every question in a pool once, in a random order, before starting again.
+
+    Each pass walks the pool as (stride * position + offset) % len(pool) with a
+    random stride coprime to the pool size, so the whole order is three numbers
+    rather than a shuffled copy of the pool, and dealing is O(1).
+    """
+
+    def __init__(self, pool, rng=random):
+        self.pool = pool
+        self.rng = rng
+        self.shuffle()
+
+    def shuffle(self):
+        size = len(self.pool)
+        self.stride = self.rng.randrange(size) + 1
+        # Next coprime stride up, only ever a few steps away
+        while math.gcd(self.stride, size) != 1:
+            self.stride += 1
+        self.offset = self.rng.randrange(size)
+        self.position = 0
+
+    def deal(self):
+        if self.position == len(self.pool):
+            self.shuffle()
+        index = (self.stride * self.position + self.offset) % len(self.pool)
+        self.position += 1
+        return self.pool[index]
+
+
+class QUESTION_BANK:
+    """A deck per tier plus distractors drawn from the tier's answer range.
+
+    pools maps tiers to POOL or CURRICULUM objects, the generated tiers are
+    used for any tier not in it. Decks are only made for tiers that are asked for.
+    """
+
+    def __init__(self, rng=random, pools=None):
+        self.rng = rng
+        self.pools = dict(pools or {})
+        self.decks = {}
+
+    def deck(self, tier):
+        if tier not in self.decks:
+            if tier not in self.pools:
+                self.pools[tier] = shared_pool(tier)
+            self.decks[tier] = DECK(self.pools[tier], self.rng)
+        return self.decks[tier]
+
+    def deal(self, tier):
+        return self.deck(tier).deal()
+
+    def distractors(self, tier, correct, count=1):
+        """count different wrong answers from the tier's answer range, O(count) with no rejection.
+
+        Numbers are drawn from the range with one fewer value than it has and
+        everything from the correct answer up shifted along by one, so the
+        correct answer can never come out.
+        """
+        pool = self.deck(tier).pool
+        low, high = pool.low, max(pool.high, pool.low + count)
+        if not low <= correct <= high:
+            # Outside the range nothing needs skipping
+            return self.rng.sample(range(low, high + 1), count)
+        return [value + (value >= correct) for value in self.rng.sample(range(low, high), count)]
+
+
+_shared_pools = {}
+
+
+def shared_pool(tier):
+    """Generated pool for tier, built the first time it is asked for"""
+    if tier not in _shared_pools:
+        _shared_pools[tier] = POOL.tier(tier)
+    return _shared_pools[tier]
+
+
+def benchmark(deals=100_000, distractors=3):
+    """Deals per second from each generated tier and from the same questions as a curriculum file"""
+    import tempfile
+
+    for tier in TIERS:
+        bank = QUESTION_BANK(random.Random(0))
+        start = time.perf_counter()
+        for _ in range(deals):
+            a, op, b = bank.deal(tier)
+            bank.distractors(tier, answer(a, op, b), distractors)
+        rate = deals / (time.perf_counter() - start)
+        print(f"tier {tier}: {len(shared_pool(tier)):>5} questions, {rate:>9,.0f} questions/sec with {distractors} distractors")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'curriculum.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            for _ in range(100):
+                for a, op, b in generate(4):
+                    f.write(f"{a} {op} {b}\n")
+
+        start = time.perf_counter()
+        curriculum = CURRICULUM(path)
+        index_time = time.perf_counter() - start
+
+        bank = QUESTION_BANK(random.Random(0), {5: curriculum})
+        start = time.perf_counter()
+        for _ in range(deals):
+            a, op, b = bank.deal(5)
+            bank.distractors(5, answer(a, op, b), distractors)
+        rate = deals / (time.perf_counter() - start)
+        print(f"curriculum: {len(curriculum):>5} questions, indexed in {index_time * 1000:.0f} ms, "
+              f"{rate:>9,.0f} questions/sec with {distractors} distractors")
+        curriculum.close()
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
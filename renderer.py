@@ -0,0 +1,177 @@
+import time
+import pygame
+from camera import CAMERA
+
+
+class RENDERER:
+    """Draws a MAIN game to the window, only touching what changed since the last frame.
+
+    The border is baked into one background surface up front and the board
+    colour and grass into another, one cell bigger than the camera's view so the
+    grass can be lined up with the camera whichever cell it starts on. The board
+    is tracked as a map of world cell -> what is drawn on it, rebuilt only when
+    the game ticks and only for cells in view. Cells whose contents changed are
+    restored from the background and drawn again, and the whole view is redrawn
+    when the camera scrolls. HUD boxes are redrawn when their text changes.
+    draw() returns the dirty rects for pygame.display.update.
+    """
+
+    def __init__(self, window, main_game, cell_size, camera, board_color=(175, 215, 70), border_color=(30, 30, 30)):
+        self.window = window
+        self.main_game = main_game
+        self.cell_size = cell_size
+        self.camera = camera
+
+        self.background = pygame.Surface(window.get_size()).convert()
+        self.background.fill(border_color)
+        self.board_rect = pygame.Rect(0, 0, cell_size * camera.view_cells, cell_size * camera.view_cells)
+
+        # Grass for world cells 0..view_cells, drawn with a camera sitting at the top left
+        grass_view = CAMERA(main_game.cell_number, camera.view_cells + 1)
+        self.board_background = pygame.Surface((cell_size * (camera.view_cells + 1),) * 2).convert()
+        self.board_background.fill(board_color)
+        main_game.draw_grass(self.board_background, grass_view)
+
+        # What is currently on screen
+        self.cells = {}
+        self.ticks = None
+        self.camera_pos = None
+        self.hud_keys = {}
+        self.hud_rects = {}
+        self.drawn = False
+
+        # Stats, blits counts every restore, sprite, fruit, obstacle and HUD box drawn
+        self.frames = 0
+        self.blits = 0
+        self.frame_time = 0
+        self.dirty_area = 0
+        self.total_blits = 0
+        self.total_time = 0
+        self.total_dirty_area = 0
+
+    def board_cells(self):
+        """Map of world cell -> things drawn on it for cells in view, in the same order as draw_elements"""
+        cells = {}
+        camera = self.camera
+        left, top, right, bottom = camera.x, camera.y, camera.x + camera.view_cells, camera.y + camera.view_cells
+        for block, sprite in self.main_game.snake.segment_sprites():
+            x, y = int(block.x), int(block.y)
+            if left <= x < right and top <= y < bottom:
+                cells.setdefault((x, y), []).append(sprite)
+        for entity in self.main_game.entities.values():
+            x, y = entity.x, entity.y
+            if left <= x < right and top <= y < bottom:
+                # The answer is part of the entry so a fruit respawning on the same cell still redraws
+                cells.setdefault((x, y), []).append((entity, getattr(entity, 'answer', None)))
+        return cells
+
+    def restore(self, rect):
+        """Put the board background back under a rect of the view"""
+        offset = (self.camera.x % 2 * self.cell_size, self.camera.y % 2 * self.cell_size)
+        self.window.blit(self.board_background, rect, rect.move(offset))
+        self.blits += 1
+
+    def draw_items(self, items, rect):
+        for item in items:
+            if isinstance(item, tuple):
+                self.window.blits(item[0].blits(rect), doreturn=False)
+            else:
+                self.window.blit(item, rect)
+            self.blits += 1
+
+    def draw_board(self, dirty):
+        if self.main_game.ticks == self.ticks:
+            return
+        self.ticks = self.main_game.ticks
+
+        self.camera.follow(self.main_game.snake.body[0])
+        cells = self.board_cells()
+
+        if (self.camera.x, self.camera.y) != self.camera_pos:
+            # Everything in view moved, repaint the whole board
+            self.camera_pos = (self.camera.x, self.camera.y)
+            self.restore(self.board_rect)
+            for cell, items in cells.items():
+                self.draw_items(items, self.camera.cell_rect(pygame.Vector2(cell), self.cell_size))
+            dirty.append(self.board_rect)
+        else:
+            for cell in self.cells.keys() | cells.keys():
+                items = cells.get(cell)
+                if items == self.cells.get(cell):
+                    continue
+                rect = self.camera.cell_rect(pygame.Vector2(cell), self.cell_size)
+                self.restore(rect)
+                self.draw_items(items or (), rect)
+                dirty.append(rect)
+        self.cells = cells
+
+    def hud(self):
+        """Map of HUD box -> (key, draw function), a box is redrawn when its key changes"""
+        question = self.main_game.question
+        question.update_status()
+        return {
+            'score': (len(self.main_game.snake.body), self.main_game.draw_score),
+            'question': (question.text, question.draw_question),
+            'status': ((question.status, question.status_color), question.draw_status),
+        }
+
+    def draw_hud(self, dirty):
+        for name, (key, draw) in self.hud().items():
+            if name in self.hud_keys and self.hud_keys[name] == key:
+                continue
+
+            old_rect = self.hud_rects.get(name)
+            if old_rect:
+                self.window.blit(self.background, old_rect, old_rect)
+                self.blits += 1
+                dirty.append(old_rect)
+
+            rect = draw()
+            if rect:
+                self.blits += 1
+                dirty.append(rect)
+            self.hud_keys[name] = key
+            self.hud_rects[name] = rect
+
+    def draw(self):
+        """Bring the window up to date with the game, returns the list of rects that changed"""
+        start = time.perf_counter()
+        self.blits = 0
+        dirty = []
+
+        full = not self.drawn
+        if full:
+            self.window.blit(self.background, (0, 0))
+            self.blits += 1
+            self.drawn = True
+
+        self.draw_board(dirty)
+        self.draw_hud(dirty)
+
+        if full:
+            dirty = [self.window.get_rect()]
+
+        self.frames += 1
+        self.frame_time = time.perf_counter() - start
+        self.dirty_area = sum(rect.width * rect.height for rect in dirty)
+        self.total_blits += self.blits
+        self.total_time += self.frame_time
+        self.total_dirty_area += self.dirty_area
+        return dirty
+
+    def redraw(self):
+        """Forget what is on screen so the next draw repaints everything"""
+        self.cells = {}
+        self.ticks = None
+        self.camera_pos = None
+        self.hud_keys = {}
+        self.hud_rects = {}
+        self.drawn = False
+
+    def report(self):
+        if not self.frames:
+            return "No frames drawn"
+        window_area = self.window.get_width() * self.window.get_height()
+        return (f"{self.frames} frames, {self.total_blits / self.frames:.2f} blits/frame, "
+                f"{self.total_time / self.frames * 1000:.3f} ms/frame, "
+                f"{self.total_dirty_area / self.frames / window_area:.2%} of the window updated per frame")
@@ -0,0 +1,176 @@
+import struct, sys, time
+from pygame.math import Vector2
+import engine
+from engine import DIRECTIONS
+
+MAGIC = b'SNKR'
+VERSION = 3
+# magic, version, cell_number, question tier, seed, number of ticks, bad fruits, obstacles
+HEADER = struct.Struct('<4sBHBQIHI')
+
+# The turn taken on each tick, stored as 2 bit codes. Reversing is never allowed,
+# so a moving snake only ever keeps going or turns one way or the other. ABSOLUTE
+# is only needed when it starts from standing still, and is followed by 2 more
+# bits giving the direction.
+KEEP, COUNTER_CLOCKWISE, CLOCKWISE, ABSOLUTE = range(4)
+
+
+def encode_turn(before, after):
+    """Code for the turn from direction before to after, ABSOLUTE + direction index when starting off"""
+    if after == before:
+        return KEEP
+    new = DIRECTIONS.index(after)
+    if before == Vector2(0, 0):
+        return ABSOLUTE + new
+    return CLOCKWISE if new == (DIRECTIONS.index(before) + 1) % 4 else COUNTER_CLOCKWISE
+
+
+def apply_turn(main_game, turn):
+    if turn == KEEP:
+        return
+    if turn >= ABSOLUTE:
+        main_game.snake.direction = DIRECTIONS[turn - ABSOLUTE]
+    else:
+        step = 1 if turn == CLOCKWISE else -1
+        main_game.snake.direction = DIRECTIONS[(DIRECTIONS.index(main_game.snake.direction) + step) % 4]
+
+
+class REPLAY:
+    """A whole game as the seed it was created with plus the turn taken on every tick"""
+
+    def __init__(self, cell_number, seed, turns=None, tier=1, distractors=1, obstacles=0):
+        self.cell_number = cell_number
+        self.seed = seed
+        self.tier = tier
+        self.distractors = distractors
+        self.obstacles = obstacles
+        # One code per tick, ABSOLUTE + direction index for starting off
+        self.turns = turns if turns is not None else bytearray()
+
+    def __len__(self):
+        return len(self.turns)
+
+    def to_bytes(self):
+        # 2 bit symbols packed four to a byte, lowest bits first
+        packed = bytearray(HEADER.pack(MAGIC, VERSION, self.cell_number, self.tier, self.seed, len(self.turns),
+                                         self.distractors, self.obstacles))
+        bits = 0
+        count = 0
+        for turn in self.turns:
+            if turn >= ABSOLUTE:
+                bits |= (ABSOLUTE | (turn - ABSOLUTE) << 2) << count
+                count += 4
+            else:
+                bits |= turn << count
+                count += 2
+            while count >= 8:
+                packed.append(bits & 0xFF)
+                bits >>= 8
+                count -= 8
+        if count:
+            packed.append(bits)
+        return bytes(packed)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, cell_number, tier, seed, ticks, distractors, obstacles = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a replay file, or written by a different version")
+
+        symbols = (byte >> shift & 3 for byte in data[HEADER.size:] for shift in (0, 2, 4, 6))
+        turns = bytearray(ticks)
+        for tick in range(ticks):
+            turn = next(symbols)
+            if turn == ABSOLUTE:
+                turn += next(symbols)
+            turns[tick] = turn
+        return cls(cell_number, seed, turns, tier, distractors, obstacles)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class RECORDER:
+    """Logs the turn taken on each tick of a seeded game.
+
+    Call update() in place of main_game.update() from the game's first tick, and
+    turn with queue_turn so the turn is seen by the tick that applies it.
+    """
+
+    def __init__(self, main_game):
+        if main_game.seed is None:
+            raise ValueError("Only games created with a seed can be replayed")
+        self.main_game = main_game
+        self.replay = REPLAY(main_game.cell_number, main_game.seed, tier=main_game.tier,
+                             distractors=main_game.distractors, obstacles=len(main_game.obstacles))
+
+    def update(self):
+        before = self.main_game.snake.direction
+        self.main_game.update()
+        self.replay.turns.append(encode_turn(before, self.main_game.tick_direction))
+
+    def step(self, action=None):
+        """Same as MAIN.step, but recorded"""
+        if action is not None:
+            self.main_game.queue_turn(action)
+        self.update()
+        return self.main_game.event
+
+
+class PLAYER:
+    """Plays a REPLAY back on a headless MAIN.
+
+    An exact MAIN.snapshot of the game is kept every snapshot_every ticks as they
+    are played, so seek() only has to re-simulate from the nearest one before the
+    target.
+    """
+
+    def __init__(self, replay, snapshot_every=1000):
+        self.replay = replay
+        self.snapshot_every = snapshot_every
+        self.main_game = engine.MAIN(replay.cell_number, replay.seed, replay.tier,
+                                     distractors=replay.distractors, obstacles=replay.obstacles)
+        self.tick = 0
+        self.snapshots = {0: self.main_game.snapshot()}
+
+    def step(self):
+        apply_turn(self.main_game, self.replay.turns[self.tick])
+        self.main_game.update()
+        self.tick += 1
+        if self.tick % self.snapshot_every == 0 and self.tick not in self.snapshots:
+            self.snapshots[self.tick] = self.main_game.snapshot()
+
+    def seek(self, tick):
+        """Get the game to the state it was in after tick ticks"""
+        tick = min(max(tick, 0), len(self.replay))
+        nearest = max(t for t in self.snapshots if t <= tick)
+        if tick < self.tick or nearest > self.tick:
+            self.main_game.restore(self.snapshots[nearest])
+            self.tick = nearest
+        while self.tick < tick:
+            self.step()
+        return self.main_game
+
+    def run(self):
+        return self.seek(len(self.replay))
+
+
+if __name__ == '__main__':
+    replay = REPLAY.load(sys.argv[1])
+    player = PLAYER(replay)
+    tick = int(sys.argv[2]) if len(sys.argv) > 2 else len(replay)
+
+    start = time.perf_counter()
+    main_game = player.seek(tick)
+    elapsed = time.perf_counter() - start
+
+    # The game itself ticks every 150 ms
+    real_time = tick * 0.15
+    print(f"Tick {tick} of {len(replay)}, length {len(main_game.snake.body)}, score {len(main_game.snake.body) - 3}")
+    print(f"Replayed in {elapsed:.3f} s, {real_time / elapsed if elapsed else float('inf'):,.0f}x real time")
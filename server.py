@@ -0,0 +1,158 @@
+import asyncio, random, struct, sys, time
+import engine
+from stream import ENCODER
+from ticker import TICKER
+
+# Every message either way is a uint32 byte count then that many bytes. The server
+# sends a stream.ENCODER frame of the client's game after every tick, the client
+# sends one byte per turn, engine.UP/RIGHT/DOWN/LEFT.
+FRAME = struct.Struct('<I')
+# Clients sending bigger frames than this are disconnected
+MAX_INPUT = 64
+PORT = 8765
+
+
+class SESSION:
+    """One connected client and the game it is playing"""
+
+    def __init__(self, writer, cell_number, tier):
+        self.writer = writer
+        self.main_game = engine.MAIN(cell_number, seed=random.randrange(2 ** 64), tier=tier)
+        self.encoder = ENCODER(self.main_game)
+        self.sent = 0
+        self.skipped = 0
+
+
+class SERVER:
+    """Runs every session's game on one shared fixed timestep.
+
+    A single scheduler task ticks all the sessions in one pass and writes each
+    client its new state, rather than a timer per session. Turns are queued on
+    the game as they arrive and applied by its next tick, the same as the arrow
+    keys in game.py. A client whose socket is still holding more than
+    max_buffer unsent bytes misses that tick's frame, and the next one it gets
+    is a keyframe that brings it fully up to date.
+    """
+
+    def __init__(self, tick_ms=150, cell_number=engine.CELL_NUMBER, tier=1, max_buffer=64 * 1024):
+        self.cell_number = cell_number
+        self.tier = tier
+        self.max_buffer = max_buffer
+        self.sessions = set()
+        # At most one tick is made up after a stall, an overloaded server falls behind rather than bursting
+        self.ticker = TICKER(tick_ms, max_catch_up=1)
+
+        self.passes = 0
+        self.pass_time = 0
+        self.max_pass_time = 0
+        self.overruns = 0
+
+    async def handle(self, reader, writer):
+        session = SESSION(writer, self.cell_number, self.tier)
+        self.sessions.add(session)
+        try:
+            while True:
+                size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+                if size > MAX_INPUT:
+                    break
+                for action in await reader.readexactly(size):
+                    if action < 4:
+                        session.main_game.queue_turn(action)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The client went away
+            pass
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+
+    def tick(self):
+        """Advance every game one tick and send each client its frame, all in one pass"""
+        start = time.perf_counter()
+        for session in self.sessions:
+            session.main_game.update()
+            transport = session.writer.transport
+            if transport.is_closing() or transport.get_write_buffer_size() > self.max_buffer:
+                session.encoder.skip()
+                session.skipped += 1
+                continue
+            frame = session.encoder.encode()
+            transport.write(FRAME.pack(len(frame)) + frame)
+            session.sent += 1
+
+        elapsed = time.perf_counter() - start
+        self.passes += 1
+        self.pass_time += elapsed
+        self.max_pass_time = max(self.max_pass_time, elapsed)
+        if elapsed > self.ticker.tick_length:
+            self.overruns += 1
+
+    async def schedule(self):
+        while True:
+            for _ in range(self.ticker.advance()):
+                self.tick()
+            # Sleep until the next tick is due
+            await asyncio.sleep(max(0, self.ticker.tick_length - self.ticker.accumulator))
+
+    async def serve(self, host='127.0.0.1', port=PORT, report_every=5):
+        # A load test connects thousands of clients at once
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        # Kept so the task isn't garbage collected while it runs
+        self.scheduler = asyncio.create_task(self.schedule())
+        print(f"Serving on {host}:{port}, {self.ticker.tick_length * 1000:.0f} ms ticks")
+        async with server:
+            while True:
+                await asyncio.sleep(report_every)
+                print(self.report())
+
+    def report(self):
+        if not self.passes:
+            return f"{len(self.sessions)} sessions, no ticks yet"
+        skipped = sum(session.skipped for session in self.sessions)
+        return (f"{len(self.sessions)} sessions: pass {self.pass_time / self.passes * 1000:.2f} ms mean "
+                f"{self.max_pass_time * 1000:.2f} ms max, {self.overruns} over the tick, "
+                f"{skipped} frames skipped for slow clients | {self.ticker.report()}")
+
+
+async def load_client(host, port, seconds, stats):
+    """One fake player, reading every frame and turning now and then"""
+    reader, writer = await asyncio.open_connection(host, port)
+    rng = random.Random()
+    loop = asyncio.get_running_loop()
+    end = loop.time() + seconds
+    try:
+        while loop.time() < end:
+            size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+            await reader.readexactly(size)
+            stats['frames'] += 1
+            stats['bytes'] += FRAME.size + size
+            if rng.random() < 0.2:
+                writer.write(FRAME.pack(1) + bytes([rng.randrange(4)]))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        stats['dropped'] += 1
+    finally:
+        writer.close()
+
+
+async def load_test(sessions, seconds=10, host='127.0.0.1', port=PORT, tick_ms=150):
+    """Connect sessions clients at once and report how many frames each got against the tick rate"""
+    stats = {'frames': 0, 'bytes': 0, 'dropped': 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(load_client(host, port, seconds, stats) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    expected = sessions * elapsed * 1000 / tick_ms
+    print(f"{sessions} sessions for {elapsed:.1f} s: {stats['frames'] / elapsed:,.0f} frames/sec, "
+          f"{stats['frames'] / expected:.1%} of the frames a {tick_ms} ms tick should give, "
+          f"{stats['bytes'] / elapsed / 1024:,.0f} KiB/sec, {stats['dropped']} disconnected early")
+    return stats['frames'] / expected
+
+
+if __name__ == '__main__':
+    # python server.py serve [port] or python server.py load [sessions] [seconds] [port]
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'serve'
+    if mode == 'serve':
+        asyncio.run(SERVER().serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else PORT))
+    else:
+        sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        seconds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+        asyncio.run(load_test(sessions, seconds, port=int(sys.argv[4]) if len(sys.argv) > 4 else PORT))
@@ -0,0 +1,106 @@
+import json, math, os, sys, time
+import pygame
+
+# Same files SpriteExtractor reads and writes
+SPRITESHEET_PATH = 'Graphics/SnakeSprites.png'
+SPRITE_DATA_FILE = 'sprite_data.json'
+EXTRACTED_DIR = 'extracted_sprites'
+
+
+class SPRITE_ATLAS:
+    """Every sprite in sprite_data.json cut from the spritesheet and scaled once to cell_size.
+
+    The scaled sprites are packed into one surface and handed out as subsurfaces.
+    Names missing from sprite_data.json fall back to loading their own png, so
+    the game still works from extracted_sprites/ alone.
+    """
+
+    def __init__(self, cell_size, sheet_path=SPRITESHEET_PATH, data_path=SPRITE_DATA_FILE):
+        self.cell_size = cell_size
+        self.sprites = {}
+
+        rects = {}
+        if os.path.exists(data_path):
+            with open(data_path, 'r') as f:
+                rects = {s['name']: pygame.Rect(s['x'], s['y'], s['w'], s['h']) for s in json.load(f)}
+        if not rects or not os.path.exists(sheet_path):
+            self.surface = None
+            return
+
+        sheet = pygame.image.load(sheet_path).convert_alpha()
+        columns = math.ceil(math.sqrt(len(rects)))
+        rows = math.ceil(len(rects) / columns)
+        self.surface = pygame.Surface((columns * cell_size, rows * cell_size), pygame.SRCALPHA).convert_alpha()
+
+        for index, (name, rect) in enumerate(rects.items()):
+            rect = rect.clip(sheet.get_rect())
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            slot = pygame.Rect(index % columns * cell_size, index // columns * cell_size, cell_size, cell_size)
+            self.surface.blit(pygame.transform.scale(sheet.subsurface(rect), slot.size), slot)
+            self.sprites[name] = self.surface.subsurface(slot)
+
+    def get(self, name, path=None):
+        """Sprite called name (a trailing .png is ignored), loading path or extracted_sprites/name.png if it isn't in the atlas"""
+        name = os.path.splitext(name)[0]
+        if name not in self.sprites:
+            if path is None:
+                path = os.path.join(EXTRACTED_DIR, f'{name}.png')
+            image = pygame.image.load(path).convert_alpha()
+            self.sprites[name] = pygame.transform.scale(image, (self.cell_size, self.cell_size))
+        return self.sprites[name]
+
+    def memory(self):
+        """Bytes held by the atlas surface plus any sprites that had to be loaded on their own"""
+        surfaces = [s for s in self.sprites.values() if s.get_parent() is None]
+        if self.surface is not None:
+            surfaces.append(self.surface)
+        return sum(s.get_width() * s.get_height() * s.get_bytesize() for s in surfaces)
+
+
+atlases = {}
+
+
+def load_atlas(cell_size):
+    """Shared atlas for cell_size, built the first time it is asked for"""
+    if cell_size not in atlases:
+        atlases[cell_size] = SPRITE_ATLAS(cell_size)
+    return atlases[cell_size]
+
+
+def benchmark(cell_size=40, repeats=20):
+    """Startup time and memory for loading the snake sprites one png at a time against the atlas"""
+    names = ['head_up', 'head_down', 'head_right', 'head_left', 'tail_up', 'tail_down', 'tail_right',
+             'tail_left', 'body_vertical', 'body_horizontal', 'tr', 'tl', 'bl', 'br']
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        separate = [pygame.transform.scale(pygame.image.load(os.path.join(EXTRACTED_DIR, f'{name}.png')).convert_alpha(),
+                                           (cell_size, cell_size)) for name in names]
+    separate_time = (time.perf_counter() - start) / repeats
+    separate_memory = sum(s.get_width() * s.get_height() * s.get_bytesize() for s in separate)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        atlas = SPRITE_ATLAS(cell_size)
+        for name in names:
+            atlas.get(name)
+    atlas_time = (time.perf_counter() - start) / repeats
+
+    load_atlas(cell_size)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for name in names:
+            load_atlas(cell_size).get(name)
+    cached_time = (time.perf_counter() - start) / repeats
+
+    print(f"Separate pngs: {separate_time * 1000:.2f} ms, {separate_memory / 1024:.1f} KiB")
+    print(f"Atlas build:   {atlas_time * 1000:.2f} ms, {atlas.memory() / 1024:.1f} KiB")
+    print(f"Atlas reuse:   {cached_time * 1000:.3f} ms per SNAKE")
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -2,6 +2,11 @@ import pygame
 import sys
 import json
 import os
+import hashlib
+import time
+from collections import OrderedDict
+from multiprocessing import Pool, cpu_count
+from text_cache import TEXT_CACHE
 
 # Initialize Pygame
 pygame.init()
@@ -10,10 +15,17 @@ pygame.init()
 SPRITESHEET_PATH = 'Graphics/SnakeSprites.png'  # Change this to your file path
 OUTPUT_DIR = 'extracted_sprites'
 SPRITE_DATA_FILE = 'sprite_data.json'
+# Hashes of each sprite's source pixels and saved png from the last batch export
+MANIFEST_FILE = os.path.join(OUTPUT_DIR, 'manifest.json')
 
 # Alternative: Use absolute path if relative doesn't work
 # SPRITESHEET_PATH = '/Users/benanton/PycharmProjects/Snakulator/Graphics/SnakeSprites.png'
-SCALE = 3  # Scale factor for easier viewing
+SCALE = 3  # Scale factor for easier viewing, the starting zoom
+ZOOM_LEVELS = (0.125, 0.25, 0.5, 1, 2, 3, 4, 6, 8, 12, 16)
+VIEWPORT_SIZE = (960, 800)  # The sheet is shown through this, whatever its size
+TILE_SIZE = 256  # Scaled tiles are about this many screen pixels across
+TILE_CACHE_SIZE = 64  # Scaled tiles kept, a few screens' worth
+PAN_STEP = 200  # Screen pixels per arrow key press
 GRID_SIZE = 16  # Snap to grid (16 or 32 pixels typically)
 SNAP_TO_GRID = True
 
@@ -23,58 +35,265 @@ GRID_COLOR = (60, 60, 60)
 SELECTION_COLOR = (255, 255, 0)
 SAVED_COLOR = (0, 255, 0)
 CURRENT_COLOR = (255, 0, 0)
+PAN_KEYS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
+
+
+def load_spritesheet():
+    """Load SPRITESHEET_PATH, relative to this script or else the working directory, exits if it can't"""
+    try:
+        # Try to resolve the path
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        full_path = os.path.join(script_dir, SPRITESHEET_PATH)
+
+        print(f"Looking for spritesheet at: {full_path}")
+
+        if os.path.exists(full_path):
+            spritesheet = pygame.image.load(full_path)
+            print(f"Successfully loaded: {full_path}")
+        elif os.path.exists(SPRITESHEET_PATH):
+            spritesheet = pygame.image.load(SPRITESHEET_PATH)
+            print(f"Successfully loaded: {SPRITESHEET_PATH}")
+        else:
+            print(f"Error: Could not find file at:")
+            print(f"  - {full_path}")
+            print(f"  - {SPRITESHEET_PATH}")
+            print(f"\nCurrent working directory: {os.getcwd()}")
+            print(f"Script directory: {script_dir}")
+            sys.exit(1)
+    except Exception as e:
+        print(f"Error loading spritesheet: {e}")
+        sys.exit(1)
+    return spritesheet
+
+
+def cut_sprite(spritesheet, x, y, w, h):
+    """The sprite at (x, y, w, h) on its own transparent surface, anything off the sheet left clear"""
+    sprite_surface = pygame.Surface((w, h), pygame.SRCALPHA)
+    sprite_surface.blit(spritesheet, (0, 0), (x, y, w, h))
+    return sprite_surface
+
+
+def runs(occupied, min_gap=1):
+    """Start and end indices of each run of True in a 1-d array, joining runs less than min_gap apart"""
+    import numpy as np
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], occupied.view(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if min_gap > 1 and len(starts) > 1:
+        # A run is kept apart only if the gap before it is wide enough
+        split = starts[1:] - ends[:-1] >= min_gap
+        starts, ends = starts[np.concatenate(([True], split))], ends[np.concatenate((split, [True]))]
+    return starts, ends
+
+
+def detect_sprites(spritesheet, grid_size=None, min_gap=1, min_size=2):
+    """Rectangles (x, y, w, h) around the sprites on a sheet, in reading order, found from its alpha channel.
+
+    With a grid_size, every grid cell holding a visible pixel is a sprite.
+    Otherwise the sheet is cut along fully transparent rows and columns,
+    over and over, until each piece can't be cut any further, and each piece
+    is trimmed to its pixels. Transparent gaps narrower than min_gap pixels
+    don't split a sprite, and pieces under min_size pixels both wide and
+    high are dropped as specks. Both only work on whole rows and columns at a time
+    with numpy, so a 4096x4096 sheet takes a fraction of a second.
+    """
+    import numpy as np
+    # Indexed [x, y]. Surfaces with per pixel alpha are read in place, array_alpha
+    # copies pixel by pixel and is many times slower, but also handles colorkeys
+    if spritesheet.get_flags() & pygame.SRCALPHA:
+        alpha = pygame.surfarray.pixels_alpha(spritesheet)
+        visible = alpha > 0
+        # Unlocks the sheet
+        del alpha
+    else:
+        visible = pygame.surfarray.array_alpha(spritesheet) > 0
+    width, height = visible.shape
+
+    if grid_size:
+        columns, rows = -(-width // grid_size), -(-height // grid_size)
+        padded = np.zeros((columns * grid_size, rows * grid_size), bool)
+        padded[:width, :height] = visible
+        cells = padded.reshape(columns, grid_size, rows, grid_size).any(axis=(1, 3))
+        # argwhere on the transpose gives (row, column) pairs, row by row
+        return [(int(column) * grid_size, int(row) * grid_size,
+                 min(grid_size, width - int(column) * grid_size), min(grid_size, height - int(row) * grid_size))
+                for row, column in np.argwhere(cells.T)]
+
+    found = []
+
+    def cut(x0, x1, y0, y1):
+        piece = visible[x0:x1, y0:y1]
+        row_starts, row_ends = runs(piece.any(axis=0), min_gap)
+        if len(row_starts) > 1:
+            # Rows first, so sprites come out top to bottom then left to right
+            for start, end in zip(row_starts, row_ends):
+                cut(x0, x1, y0 + int(start), y0 + int(end))
+            return
+        column_starts, column_ends = runs(piece.any(axis=1), min_gap)
+        if len(column_starts) > 1:
+            for start, end in zip(column_starts, column_ends):
+                cut(x0 + int(start), x0 + int(end), y0, y1)
+            return
+        if len(row_starts) and len(column_starts):
+            x, y = x0 + int(column_starts[0]), y0 + int(row_starts[0])
+            w, h = int(column_ends[0] - column_starts[0]), int(row_ends[0] - row_starts[0])
+            if w >= min_size or h >= min_size:
+                found.append((x, y, w, h))
+
+    cut(0, width, 0, height)
+    return found
+
+
+def add_sprites(sprites, rects):
+    """Append each rect not already in sprites as a new (name, x, y, w, h), returns how many were added"""
+    saved = {tuple(sprite[1:]) for sprite in sprites}
+    names = {sprite[0] for sprite in sprites}
+    index = len(sprites)
+    added = 0
+    for rect in rects:
+        if rect in saved:
+            continue
+        while f"sprite_{index:03d}" in names:
+            index += 1
+        sprites.append((f"sprite_{index:03d}", *rect))
+        names.add(sprites[-1][0])
+        added += 1
+    return added
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def save_sprite(job):
+    """Write one sprite's RGBA pixels as a png, run in the batch workers. Returns (name, hash of the file)"""
+    name, w, h, pixels = job
+    filepath = os.path.join(OUTPUT_DIR, f"{name}.png")
+    pygame.image.save(pygame.image.frombuffer(pixels, (w, h), 'RGBA'), filepath)
+    return name, file_hash(filepath)
+
+
+def batch_detect(grid_size=None):
+    """Add the sprites detect_sprites finds to SPRITE_DATA_FILE without opening a window"""
+    spritesheet = load_spritesheet()
+    sprites = []
+    if os.path.exists(SPRITE_DATA_FILE):
+        with open(SPRITE_DATA_FILE, 'r') as f:
+            sprites = [(s['name'], s['x'], s['y'], s['w'], s['h']) for s in json.load(f)]
+
+    start = time.perf_counter()
+    rects = detect_sprites(spritesheet, grid_size)
+    elapsed = time.perf_counter() - start
+    added = add_sprites(sprites, rects)
+
+    with open(SPRITE_DATA_FILE, 'w') as f:
+        json.dump([{'name': name, 'x': x, 'y': y, 'w': w, 'h': h} for name, x, y, w, h in sprites], f, indent=2)
+    print(f"Detected {len(rects)} sprites in {elapsed * 1000:.0f} ms, added {added} to {SPRITE_DATA_FILE}")
+    return added
+
+
+def batch_extract(workers=None, force=False):
+    """Export every sprite in SPRITE_DATA_FILE without opening a window.
+
+    Each sprite's pixels are hashed along with its size, and the sprite is
+    skipped if that hash and the hash of its png on disk both match
+    MANIFEST_FILE. The rest are encoded to png across a pool of workers,
+    or in this process when workers is 1. force exports everything.
+    Returns (exported, unchanged).
+    """
+    start = time.perf_counter()
+    with open(SPRITE_DATA_FILE, 'r') as f:
+        sprites = [(s['name'], s['x'], s['y'], s['w'], s['h']) for s in json.load(f)]
+    spritesheet = load_spritesheet()
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE) and not force:
+        with open(MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+
+    jobs = []
+    source_hashes = {}
+    unchanged = 0
+    for name, x, y, w, h in sprites:
+        if w <= 0 or h <= 0:
+            continue
+        pixels = pygame.image.tobytes(cut_sprite(spritesheet, x, y, w, h), 'RGBA')
+        source_hash = hashlib.sha1(f"{w}x{h}".encode() + pixels).hexdigest()
+        source_hashes[name] = source_hash
+
+        filepath = os.path.join(OUTPUT_DIR, f"{name}.png")
+        saved = manifest.get(name)
+        if saved and saved['source'] == source_hash and os.path.exists(filepath) \
+                and file_hash(filepath) == saved['output']:
+            unchanged += 1
+            continue
+        jobs.append((name, w, h, pixels))
+
+    workers = workers or cpu_count()
+    if workers == 1 or len(jobs) < 2:
+        results = list(map(save_sprite, jobs))
+    else:
+        with Pool(workers) as pool:
+            # A few chunks per worker, so one slow chunk doesn't hold up the end
+            results = list(pool.imap_unordered(save_sprite, jobs, max(1, len(jobs) // (4 * workers))))
+
+    # Sprites no longer in SPRITE_DATA_FILE drop out of the manifest, their pngs are left alone
+    manifest = {name: manifest[name] for name in source_hashes if name in manifest}
+    for name, output_hash in results:
+        manifest[name] = {'source': source_hashes[name], 'output': output_hash}
+    with open(MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"Exported {len(results)} sprites, {unchanged} unchanged, to '{OUTPUT_DIR}' "
+          f"in {time.perf_counter() - start:.2f} s")
+    return len(results), unchanged
 
 
 class SpriteExtractor:
     def __init__(self):
         # Load spritesheet (before convert_alpha, we just need to load it)
-        try:
-            # Try to resolve the path
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            full_path = os.path.join(script_dir, SPRITESHEET_PATH)
-
-            print(f"Looking for spritesheet at: {full_path}")
-
-            if os.path.exists(full_path):
-                self.spritesheet = pygame.image.load(full_path)
-                print(f"Successfully loaded: {full_path}")
-            elif os.path.exists(SPRITESHEET_PATH):
-                self.spritesheet = pygame.image.load(SPRITESHEET_PATH)
-                print(f"Successfully loaded: {SPRITESHEET_PATH}")
-            else:
-                print(f"Error: Could not find file at:")
-                print(f"  - {full_path}")
-                print(f"  - {SPRITESHEET_PATH}")
-                print(f"\nCurrent working directory: {os.getcwd()}")
-                print(f"Script directory: {script_dir}")
-                sys.exit(1)
-        except Exception as e:
-            print(f"Error loading spritesheet: {e}")
-            sys.exit(1)
+        self.spritesheet = load_spritesheet()
 
-        # Setup display first
-        self.screen_width = self.spritesheet.get_width() * SCALE + 400
-        self.screen_height = max(self.spritesheet.get_height() * SCALE + 100, 600)
+        # Setup display first. The sheet is viewed through a fixed viewport, so the
+        # window stays the same size and memory use stays flat however big the sheet is
+        self.viewport = pygame.Rect((0, 0), VIEWPORT_SIZE)
+        self.screen_width = self.viewport.width + 400
+        self.screen_height = max(self.viewport.height, 600)
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption('Spritesheet Extractor - Click and drag to select sprites')
 
         # Now convert_alpha after display is set
         self.spritesheet = self.spritesheet.convert_alpha()
 
-        # Scale up for display
-        self.scaled_sheet = pygame.transform.scale(
-            self.spritesheet,
-            (self.spritesheet.get_width() * SCALE,
-             self.spritesheet.get_height() * SCALE)
-        )
+        # Screen pixels per sheet pixel, and the screen position of the viewport's top left over the scaled sheet
+        self.zoom = SCALE
+        self.scroll = [0, 0]
+        # (zoom, column, row) -> that tile of the sheet scaled to zoom, least recently used first
+        self.tiles = OrderedDict()
 
-        # State
+        # State, the selection is in sheet coordinates
         self.start_pos = None
         self.current_pos = None
         self.sprites = []
         self.selected_sprite = None
-        self.font = pygame.font.Font(None, 24)
-        self.small_font = pygame.font.Font(None, 18)
+        self.text_cache = TEXT_CACHE()
+
+        # Drawing is cached, draw() only redraws what changed
+        # The visible part of the sheet with the grid and saved sprite outlines on it,
+        # the view it shows and the sprites outlined
+        self.sheet_view = pygame.Surface(self.viewport.size)
+        self.drawn_view = None
+        self.drawn_sprites = []
+        # Sheet rects of the sprites outlined, for finding the ones in view
+        self.sprite_rects = []
+        self.drawn_selection = None
+        self.panel_rect = pygame.Rect(self.viewport.width, 0,
+                                      self.screen_width - self.viewport.width, self.screen_height)
+        self.panel = pygame.Surface(self.panel_rect.size)
+        self.panel_key = None
+        self.redraw_all = True
 
         # Load existing sprite data if available
         self.load_sprite_data()
@@ -91,13 +310,18 @@ class SpriteExtractor:
 
     def screen_to_sheet_coords(self, pos):
         """Convert screen coordinates to spritesheet coordinates"""
-        x = pos[0] // SCALE
-        y = pos[1] // SCALE
+        x = int((pos[0] + self.scroll[0]) // self.zoom)
+        y = int((pos[1] + self.scroll[1]) // self.zoom)
         return (x, y)
 
     def sheet_to_screen_coords(self, pos):
         """Convert spritesheet coordinates to screen coordinates"""
-        return (pos[0] * SCALE, pos[1] * SCALE)
+        return (round(pos[0] * self.zoom) - self.scroll[0], round(pos[1] * self.zoom) - self.scroll[1])
+
+    def sheet_to_screen_rect(self, x, y, w, h):
+        left, top = self.sheet_to_screen_coords((x, y))
+        right, bottom = self.sheet_to_screen_coords((x + w, y + h))
+        return pygame.Rect(left, top, right - left, bottom - top)
 
     def load_sprite_data(self):
         """Load previously saved sprite data"""
@@ -124,26 +348,146 @@ class SpriteExtractor:
         if w <= 0 or h <= 0:
             return
 
-        sprite_surface = pygame.Surface((w, h), pygame.SRCALPHA)
-        sprite_surface.blit(self.spritesheet, (0, 0), (x, y, w, h))
+        sprite_surface = cut_sprite(self.spritesheet, x, y, w, h)
 
         filename = f"{name}.png"
         filepath = os.path.join(OUTPUT_DIR, filename)
         pygame.image.save(sprite_surface, filepath)
         print(f"Saved: {filepath} ({w}x{h})")
 
-    def draw_grid(self):
-        """Draw grid overlay"""
-        for x in range(0, self.scaled_sheet.get_width(), GRID_SIZE * SCALE):
-            pygame.draw.line(self.screen, GRID_COLOR, (x, 0),
-                             (x, self.scaled_sheet.get_height()), 1)
-        for y in range(0, self.scaled_sheet.get_height(), GRID_SIZE * SCALE):
-            pygame.draw.line(self.screen, GRID_COLOR, (0, y),
-                             (self.scaled_sheet.get_width(), y), 1)
+    def auto_detect(self):
+        """Add every sprite detect_sprites finds on the sheet, one per grid cell while grid snap is on"""
+        start = time.perf_counter()
+        rects = detect_sprites(self.spritesheet, GRID_SIZE if SNAP_TO_GRID else None)
+        added = add_sprites(self.sprites, rects)
+        print(f"Detected {len(rects)} sprites in {(time.perf_counter() - start) * 1000:.0f} ms, {added} new")
+        print("Press S to save them, then run 'python sprite_extractor.py batch' to export them")
+
+    def pan(self, dx, dy):
+        """Scroll by screen pixels, keeping the viewport over the sheet"""
+        max_x = max(0, round(self.spritesheet.get_width() * self.zoom) - self.viewport.width)
+        max_y = max(0, round(self.spritesheet.get_height() * self.zoom) - self.viewport.height)
+        self.scroll = [min(max(self.scroll[0] + dx, 0), max_x), min(max(self.scroll[1] + dy, 0), max_y)]
+
+    def zoom_by(self, steps, pos=None):
+        """Move steps through ZOOM_LEVELS, keeping the sheet pixel under pos (the viewport's centre by default) still"""
+        if pos is None:
+            pos = self.viewport.center
+        index = min(range(len(ZOOM_LEVELS)), key=lambda i: abs(ZOOM_LEVELS[i] - self.zoom))
+        zoom = ZOOM_LEVELS[min(max(index + steps, 0), len(ZOOM_LEVELS) - 1)]
+        # The sheet pixel under pos, as a float so it doesn't drift
+        x, y = (pos[0] + self.scroll[0]) / self.zoom, (pos[1] + self.scroll[1]) / self.zoom
+        self.zoom = zoom
+        self.scroll = [round(x * zoom) - pos[0], round(y * zoom) - pos[1]]
+        self.pan(0, 0)
+
+    def tile(self, column, row):
+        """Tile (column, row) of the sheet scaled to the current zoom, from the cache when it can be.
+
+        A tile is tile_span sheet pixels across, chosen so it scales to a
+        whole number of screen pixels, about TILE_SIZE.
+        """
+        key = (self.zoom, column, row)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+
+        span = self.tile_span()
+        area = pygame.Rect(column * span, row * span, span, span).clip(self.spritesheet.get_rect())
+        size = (max(1, round(area.width * self.zoom)), max(1, round(area.height * self.zoom)))
+        tile = pygame.transform.scale(self.spritesheet.subsurface(area), size)
+        self.tiles[key] = tile
+        if len(self.tiles) > TILE_CACHE_SIZE:
+            self.tiles.popitem(last=False)
+        return tile
+
+    def tile_span(self):
+        return max(1, round(TILE_SIZE / self.zoom))
+
+    def draw_grid(self, surface):
+        """Draw grid overlay, the visible lines only"""
+        if GRID_SIZE * self.zoom < 4:
+            # Too dense to be any use
+            return
+        sheet = self.sheet_to_screen_rect(0, 0, self.spritesheet.get_width(), self.spritesheet.get_height())
+        first_x, first_y = self.screen_to_sheet_coords((0, 0))
+        last_x, last_y = self.screen_to_sheet_coords(self.viewport.size)
+        for x in range(first_x // GRID_SIZE * GRID_SIZE, min(last_x, self.spritesheet.get_width() - 1) + 1, GRID_SIZE):
+            x = self.sheet_to_screen_coords((x, 0))[0]
+            pygame.draw.line(surface, GRID_COLOR, (x, sheet.top),
+                             (x, sheet.bottom), 1)
+        for y in range(first_y // GRID_SIZE * GRID_SIZE, min(last_y, self.spritesheet.get_height() - 1) + 1, GRID_SIZE):
+            y = self.sheet_to_screen_coords((0, y))[1]
+            pygame.draw.line(surface, GRID_COLOR, (sheet.left, y),
+                             (sheet.right, y), 1)
+
+    def draw_outlines(self, first=0):
+        """Outline the sprites from self.sprites[first] on that are in view on the sheet view, returns the rects drawn"""
+        left, top = self.screen_to_sheet_coords(self.viewport.topleft)
+        right, bottom = self.screen_to_sheet_coords(self.viewport.bottomright)
+        in_view = pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+        rects = []
+        for index in in_view.collidelistall(self.sprite_rects[first:]):
+            screen_rect = self.sheet_to_screen_rect(*self.sprite_rects[first + index])
+            pygame.draw.rect(self.sheet_view, SAVED_COLOR, screen_rect, 2)
+            rects.append(screen_rect.clip(self.viewport))
+        return rects
+
+    def update_sheet_view(self):
+        """Bring the sheet view up to date with the zoom, scroll and self.sprites, returns the rects that changed"""
+        view = (self.zoom, tuple(self.scroll))
+        drawn = len(self.drawn_sprites)
+        if self.sprites[:drawn] == self.drawn_sprites:
+            self.sprite_rects += [pygame.Rect(sprite[1:]) for sprite in self.sprites[drawn:]]
+        else:
+            self.sprite_rects = [pygame.Rect(sprite[1:]) for sprite in self.sprites]
+            self.drawn_view = None
+
+        if view == self.drawn_view:
+            # Only sprites added since, outline just those
+            rects = self.draw_outlines(drawn)
+        else:
+            self.sheet_view.fill(BG_COLOR)
+            span = self.tile_span()
+            tile_width = round(span * self.zoom)
+            first_column, first_row = self.scroll[0] // tile_width, self.scroll[1] // tile_width
+            columns = min(-(-self.spritesheet.get_width() // span), (self.scroll[0] + self.viewport.width) // tile_width + 1)
+            rows = min(-(-self.spritesheet.get_height() // span), (self.scroll[1] + self.viewport.height) // tile_width + 1)
+            for row in range(first_row, rows):
+                for column in range(first_column, columns):
+                    self.sheet_view.blit(self.tile(column, row), (column * tile_width - self.scroll[0],
+                                                                  row * tile_width - self.scroll[1]))
+            self.draw_grid(self.sheet_view)
+            self.draw_outlines()
+            rects = [self.viewport.copy()]
+            self.drawn_view = view
+        self.drawn_sprites = list(self.sprites)
+        return rects
+
+    def selection(self):
+        """Current selection as sheet (x, y, w, h), None if there isn't one"""
+        if not (self.start_pos and self.current_pos):
+            return None
+        x1, y1 = self.start_pos
+        x2, y2 = self.current_pos
+        return (min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+
+    def selection_rect(self):
+        """Screen rect of the current selection, None if there isn't one"""
+        selection = self.selection()
+        return self.sheet_to_screen_rect(*selection) if selection else None
 
     def draw_ui(self):
-        """Draw UI elements"""
-        ui_x = self.scaled_sheet.get_width() + 20
+        """Draw UI elements onto the panel, only if something it shows has changed. Returns True if it did"""
+        selection = self.selection()
+        key = (SNAP_TO_GRID, self.zoom, len(self.sprites), selection, tuple(self.sprites[-10:]))
+        if key == self.panel_key:
+            return False
+        self.panel_key = key
+
+        self.panel.fill(BG_COLOR)
+        ui_x = 20
         y = 20
 
         # Instructions
@@ -151,6 +495,9 @@ class SpriteExtractor:
             "CONTROLS:",
             "- Click & drag: Select sprite",
             "- Enter: Save selected sprite",
+            "- Wheel or +/-: Zoom",
+            "- Right drag or arrows: Pan",
+            "- A: Auto-detect sprites",
             "- D: Delete selected sprite",
             "- S: Save all data to JSON",
             "- G: Toggle grid snap",
@@ -159,24 +506,22 @@ class SpriteExtractor:
             "",
             f"Grid Snap: {'ON' if SNAP_TO_GRID else 'OFF'}",
             f"Grid Size: {GRID_SIZE}px",
+            f"Zoom: {self.zoom}x",
             f"Total Sprites: {len(self.sprites)}",
         ]
 
         for line in instructions:
-            text = self.small_font.render(line, True, (200, 200, 200))
-            self.screen.blit(text, (ui_x, y))
+            text = self.text_cache.render(line, 18, (200, 200, 200))
+            self.panel.blit(text, (ui_x, y))
             y += 25
 
         # Current selection info
-        if self.current_pos and self.start_pos:
+        if selection:
             y += 20
-            x1, y1 = self.screen_to_sheet_coords(self.start_pos)
-            x2, y2 = self.screen_to_sheet_coords(self.current_pos)
-            x, y_pos = min(x1, x2), min(y1, y2)
-            w, h = abs(x2 - x1), abs(y2 - y1)
+            x, y_pos, w, h = selection
 
-            text = self.font.render("CURRENT SELECTION:", True, (255, 255, 0))
-            self.screen.blit(text, (ui_x, y))
+            text = self.text_cache.render("CURRENT SELECTION:", 24, (255, 255, 0))
+            self.panel.blit(text, (ui_x, y))
             y += 30
 
             info = [
@@ -186,40 +531,42 @@ class SpriteExtractor:
                 "Press ENTER to save"
             ]
             for line in info:
-                text = self.small_font.render(line, True, (200, 200, 200))
-                self.screen.blit(text, (ui_x, y))
+                text = self.text_cache.render(line, 18, (200, 200, 200))
+                self.panel.blit(text, (ui_x, y))
                 y += 25
 
         # List of saved sprites
         if self.sprites:
             y = self.screen_height - 300
-            text = self.font.render("SAVED SPRITES:", True, (0, 255, 0))
-            self.screen.blit(text, (ui_x, y))
+            text = self.text_cache.render("SAVED SPRITES:", 24, (0, 255, 0))
+            self.panel.blit(text, (ui_x, y))
             y += 30
 
             # Show last 10 sprites
             for i, (name, x, y_pos, w, h) in enumerate(self.sprites[-10:]):
                 sprite_text = f"{name}: ({x},{y_pos}) {w}x{h}"
-                text = self.small_font.render(sprite_text, True, (150, 150, 150))
-                self.screen.blit(text, (ui_x, y))
+                text = self.text_cache.render(sprite_text, 18, (150, 150, 150))
+                self.panel.blit(text, (ui_x, y))
                 y += 20
+        return True
 
-    def handle_events(self):
-        """Handle user input"""
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        """Handle user input, events or else whatever is queued"""
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 return False
 
+            elif event.type == pygame.WINDOWEXPOSED:
+                # Uncovered, the window has to be drawn again in full
+                self.redraw_all = True
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     return False
 
                 elif event.key == pygame.K_RETURN and self.start_pos and self.current_pos:
                     # Save current selection
-                    x1, y1 = self.screen_to_sheet_coords(self.start_pos)
-                    x2, y2 = self.screen_to_sheet_coords(self.current_pos)
-                    x, y = min(x1, x2), min(y1, y2)
-                    w, h = abs(x2 - x1), abs(y2 - y1)
+                    x, y, w, h = self.selection()
 
                     name = f"sprite_{len(self.sprites):03d}"
                     self.sprites.append((name, x, y, w, h))
@@ -228,6 +575,10 @@ class SpriteExtractor:
                     self.start_pos = None
                     self.current_pos = None
 
+                elif event.key == pygame.K_a:
+                    # Find sprites from the sheet's transparency
+                    self.auto_detect()
+
                 elif event.key == pygame.K_s:
                     # Save sprite data
                     self.save_sprite_data()
@@ -238,6 +589,16 @@ class SpriteExtractor:
                     SNAP_TO_GRID = not SNAP_TO_GRID
                     print(f"Grid snap: {'ON' if SNAP_TO_GRID else 'OFF'}")
 
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    self.zoom_by(1)
+
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.zoom_by(-1)
+
+                elif event.key in PAN_KEYS:
+                    dx, dy = PAN_KEYS[event.key]
+                    self.pan(dx * PAN_STEP, dy * PAN_STEP)
+
                 elif event.key == pygame.K_c:
                     # Clear all sprites
                     if self.sprites:
@@ -252,62 +613,75 @@ class SpriteExtractor:
                         removed = self.sprites.pop()
                         print(f"Removed: {removed[0]}")
 
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                if event.pos[0] < self.scaled_sheet.get_width():
+            elif event.type == pygame.MOUSEWHEEL:
+                self.zoom_by(event.y, pygame.mouse.get_pos())
+
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if self.viewport.collidepoint(event.pos):
                     x, y = self.screen_to_sheet_coords(event.pos)
                     x = self.snap_to_grid(x)
                     y = self.snap_to_grid(y)
-                    self.start_pos = self.sheet_to_screen_coords((x, y))
+                    self.start_pos = (x, y)
 
-            elif event.type == pygame.MOUSEBUTTONUP:
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
                 if self.start_pos:
-                    self.current_pos = event.pos
+                    self.current_pos = self.screen_to_sheet_coords(event.pos)
 
             elif event.type == pygame.MOUSEMOTION:
-                if self.start_pos:
+                if event.buttons[2]:
+                    # Right drag pans
+                    self.pan(-event.rel[0], -event.rel[1])
+                elif self.start_pos:
                     x, y = self.screen_to_sheet_coords(event.pos)
                     x = self.snap_to_grid(x)
                     y = self.snap_to_grid(y)
-                    self.current_pos = self.sheet_to_screen_coords((x, y))
+                    self.current_pos = (x, y)
 
         return True
 
     def draw(self):
-        """Draw everything"""
-        self.screen.fill(BG_COLOR)
-
-        # Draw spritesheet
-        self.screen.blit(self.scaled_sheet, (0, 0))
-
-        # Draw grid
-        self.draw_grid()
-
-        # Draw saved sprites
-        for name, x, y, w, h in self.sprites:
-            screen_rect = pygame.Rect(x * SCALE, y * SCALE, w * SCALE, h * SCALE)
-            pygame.draw.rect(self.screen, SAVED_COLOR, screen_rect, 2)
+        """Redraw what changed since the last frame and update only those parts of the window"""
+        sheet_rects = self.update_sheet_view()
+        selection = self.selection_rect()
+        if selection:
+            # The outline is drawn 3 pixels wide and can spill over the edges
+            selection = selection.inflate(6, 6)
+
+        if self.redraw_all:
+            dirty = [self.screen.get_rect()]
+            self.redraw_all = False
+        else:
+            dirty = sheet_rects
+            if selection != self.drawn_selection:
+                # Clipped, blit doesn't shift dest for an area hanging off the top or left
+                dirty += [rect.clip(self.screen.get_rect()) for rect in (self.drawn_selection, selection) if rect]
+        self.drawn_selection = selection
+
+        # Put back the sheet, grid and saved outlines under anything that changed
+        for rect in dirty:
+            self.screen.fill(BG_COLOR, rect)
+            self.screen.blit(self.sheet_view, rect, rect)
 
         # Draw current selection
-        if self.start_pos and self.current_pos:
-            x = min(self.start_pos[0], self.current_pos[0])
-            y = min(self.start_pos[1], self.current_pos[1])
-            w = abs(self.current_pos[0] - self.start_pos[0])
-            h = abs(self.current_pos[1] - self.start_pos[1])
-            pygame.draw.rect(self.screen, CURRENT_COLOR, (x, y, w, h), 3)
+        if selection and selection.collidelist(dirty) != -1:
+            pygame.draw.rect(self.screen, CURRENT_COLOR, selection.inflate(-6, -6), 3)
 
-        # Draw UI
-        self.draw_ui()
+        # Draw UI, on top of a selection dragged over it as before
+        if self.draw_ui() or self.panel_rect.collidelist(dirty) != -1:
+            self.screen.blit(self.panel, self.panel_rect)
+            dirty.append(self.panel_rect)
 
-        pygame.display.flip()
+        if dirty:
+            pygame.display.update(dirty)
 
     def run(self):
-        """Main loop"""
+        """Main loop, sleeping until there is input so an idle editor uses no CPU"""
         clock = pygame.time.Clock()
         running = True
 
         while running:
-            running = self.handle_events()
             self.draw()
+            running = self.handle_events([pygame.event.wait()] + pygame.event.get())
             clock.tick(60)
 
         # Save on exit
@@ -320,5 +694,13 @@ class SpriteExtractor:
 
 
 if __name__ == '__main__':
-    extractor = SpriteExtractor()
-    extractor.run()
\ No newline at end of file
+    # python sprite_extractor.py to edit, without a window python sprite_extractor.py detect [grid size]
+    # adds the sprites it finds to sprite_data.json and batch [workers] [force] exports them all
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        batch_extract(int(sys.argv[2]) if len(sys.argv) > 2 else None,
+                      len(sys.argv) > 3 and sys.argv[3] == 'force')
+    elif len(sys.argv) > 1 and sys.argv[1] == 'detect':
+        batch_detect(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        extractor = SpriteExtractor()
+        extractor.run()
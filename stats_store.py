@@ -0,0 +1,284 @@
+import os, sqlite3, sys, tempfile, threading, time
+from collections import defaultdict
+
+STATS_FILE = 'stats.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY, player TEXT NOT NULL, started REAL, ended REAL, ticks INTEGER,
+    score INTEGER, correct INTEGER, wrong INTEGER, died INTEGER,
+    tier INTEGER, cell_number INTEGER, distractors INTEGER, obstacles INTEGER
+);
+-- The leaderboard reads the top of one of these and stops, however many games there are
+CREATE INDEX IF NOT EXISTS games_by_score ON games (score DESC, ended);
+CREATE INDEX IF NOT EXISTS games_by_player ON games (player, score DESC);
+
+CREATE TABLE IF NOT EXISTS answers (
+    game INTEGER NOT NULL, tick INTEGER, tier INTEGER, op TEXT, a INTEGER, b INTEGER,
+    given INTEGER, correct INTEGER, reaction_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS answers_by_game ON answers (game);
+
+-- Running totals per player and kind of question, kept up to date with every flush so the
+-- accuracy report reads a few rows rather than aggregating every answer
+CREATE TABLE IF NOT EXISTS answer_totals (
+    player TEXT, tier INTEGER, op TEXT, answered INTEGER, correct INTEGER, reaction_ms INTEGER,
+    PRIMARY KEY (player, tier, op)
+) WITHOUT ROWID;
+"""
+
+INSERT_GAME = 'INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+INSERT_ANSWER = 'INSERT INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+ADD_TOTALS = """
+INSERT INTO answer_totals VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (player, tier, op) DO UPDATE SET answered = answered + excluded.answered,
+    correct = correct + excluded.correct, reaction_ms = reaction_ms + excluded.reaction_ms
+"""
+
+
+class STATS_STORE:
+    """Games, answers and reaction times kept in a SQLite file across sessions.
+
+    Recording a game or an answer only appends a row to an in-memory buffer,
+    so the game loop never waits on the disk. A writer thread with its own
+    connection takes the whole buffer every flush_every seconds, or sooner
+    once batch rows are waiting, and writes it in one transaction. A batch
+    that fails, say because another process has the file locked, goes back
+    on the front of the buffer and is tried again on the next pass, and is
+    only given up on after retries failures in a row. Game ids
+    are handed out here rather than by SQLite, so answers can point at a game
+    before its row is written, which means only one store should write to a
+    file at a time. Reaction times are in game time, the ticks from a
+    question being asked to it being answered times tick_ms, so pauses don't
+    count.
+    """
+
+    def __init__(self, path=STATS_FILE, player='player', tick_ms=150, flush_every=1.0, batch=10_000, retries=5):
+        self.path = path
+        self.player = player
+        self.tick_ms = tick_ms
+        self.flush_every = flush_every
+        self.batch = batch
+        self.retries = retries
+
+        connection = self.connect()
+        connection.executescript(SCHEMA)
+        self.next_id = (connection.execute('SELECT MAX(id) FROM games').fetchone()[0] or 0) + 1
+        self.best = connection.execute('SELECT MAX(score) FROM games').fetchone()[0] or 0
+        connection.close()
+
+        # [game id, started, start tick, tick the question was asked, correct, wrong] of the game being played
+        self.game = None
+        self.pending = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closing = False
+
+        # Stats
+        self.rows = 0
+        self.flushes = 0
+        self.flush_time = 0
+        self.max_flush_time = 0
+        self.failures = 0
+        self.errors = 0
+        self.lost = 0
+        self.last_error = None
+
+        self.writer = threading.Thread(target=self.write_loop, name='stats writer', daemon=True)
+        self.writer.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        # Readers don't block the writer thread, and a crash can lose at most the last flush
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def add(self, statement, row):
+        with self.lock:
+            self.pending.append((statement, row))
+            full = len(self.pending) >= self.batch
+        if full:
+            self.wake.set()
+
+    def start_game(self, main_game):
+        self.game = [self.next_id, time.time(), main_game.ticks, main_game.ticks, 0, 0]
+        self.next_id += 1
+
+    def answer(self, main_game, fruit):
+        """Record the snake eating fruit, before the game moves on to the next question"""
+        if self.game is None:
+            return
+        question = main_game.question
+        correct = fruit is main_game.correct_fruit
+        reaction_ms = (main_game.ticks - self.game[3]) * self.tick_ms
+        self.add(INSERT_ANSWER, (self.game[0], main_game.ticks, question.tier, question.op, question.a, question.b,
+                                 fruit.answer, correct, reaction_ms))
+        self.add(ADD_TOTALS, (self.player, question.tier, question.op, 1, correct, reaction_ms))
+        self.game[3] = main_game.ticks
+        self.game[4 if correct else 5] += 1
+
+    def end_game(self, main_game, died=True):
+        """Record the game that is ending, call before the snake is reset"""
+        if self.game is None:
+            return
+        game_id, started, start_tick, _, correct, wrong = self.game
+        score = len(main_game.snake.body) - 3
+        self.add(INSERT_GAME, (game_id, self.player, started, time.time(), main_game.ticks - start_tick, score,
+                               correct, wrong, died, main_game.tier, main_game.cell_number,
+                               main_game.distractors, len(main_game.obstacles)))
+        self.best = max(self.best, score)
+        self.game = None
+
+    def write_loop(self):
+        connection = self.connect()
+        while True:
+            self.wake.wait(self.flush_every)
+            self.wake.clear()
+            closing = self.closing
+            self.flush(connection)
+            # A failed last batch is still waiting, closing has to wait for its retries
+            if closing and not self.pending:
+                break
+        connection.close()
+
+    def flush(self, connection):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        rows = defaultdict(list)
+        totals = defaultdict(lambda: [0, 0, 0])
+        for statement, row in pending:
+            if statement is ADD_TOTALS:
+                # Summed here first, so a batch is one upsert per kind of question
+                total = totals[row[:3]]
+                for index, value in enumerate(row[3:]):
+                    total[index] += value
+            else:
+                rows[statement].append(row)
+        rows[ADD_TOTALS] = [key + tuple(total) for key, total in totals.items()]
+        try:
+            with connection:
+                for statement, statement_rows in rows.items():
+                    connection.executemany(statement, statement_rows)
+        except sqlite3.Error as error:
+            # The transaction was rolled back, so none of the batch got written
+            self.last_error = error
+            self.failures += 1
+            if self.failures < self.retries:
+                with self.lock:
+                    self.pending[:0] = pending
+            else:
+                self.errors += 1
+                self.lost += len(pending)
+                self.failures = 0
+            return
+        self.failures = 0
+        elapsed = time.perf_counter() - start
+        self.rows += len(pending)
+        self.flushes += 1
+        self.flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    def close(self):
+        """Write everything still buffered and stop the writer thread"""
+        self.closing = True
+        self.wake.set()
+        self.writer.join()
+
+    def query(self, sql, parameters=()):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    def leaderboard(self, limit=10, player=None):
+        """(player, score, ended) of the best games, everyone's or one player's"""
+        if player is None:
+            return self.query('SELECT player, score, ended FROM games ORDER BY score DESC, ended LIMIT ?', (limit,))
+        return self.query('SELECT player, score, ended FROM games WHERE player = ? ORDER BY score DESC LIMIT ?',
+                          (player, limit))
+
+    def accuracy(self, player=None):
+        """(tier, op, answered, correct, mean reaction ms) for every kind of question answered"""
+        where = 'WHERE player = ?' if player is not None else ''
+        return self.query(f'SELECT tier, op, SUM(answered), SUM(correct), 1.0 * SUM(reaction_ms) / SUM(answered) '
+                          f'FROM answer_totals {where} GROUP BY tier, op ORDER BY tier, op',
+                          (player,) if player is not None else ())
+
+    def report(self, player=None):
+        lines = [f"Stats in '{self.path}': {self.rows:,} rows written in {self.flushes} flushes"
+                 + (f", {self.flush_time / self.flushes * 1000:.2f} ms mean {self.max_flush_time * 1000:.2f} ms max"
+                    if self.flushes else '')
+                 + (f", {self.errors} batches of {self.lost:,} rows lost, last error: {self.last_error}"
+                    if self.errors else '')]
+        for rank, (name, score, ended) in enumerate(self.leaderboard(5, player), 1):
+            lines.append(f"{rank}. {name:<12} {score:>5}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(ended))}")
+        for tier, op, answered, correct, reaction_ms in self.accuracy(player):
+            lines.append(f"tier {tier} {op}: {correct:,}/{answered:,} correct ({correct / answered:.0%}), "
+                         f"{reaction_ms / 1000:.1f} s to answer")
+        return '\n'.join(lines)
+
+
+def benchmark(games=1_000_000, answers_per_game=3, seed=0):
+    """Cost of recording on the game loop's side, write throughput and report query times
+    for a fresh file of games games, against the same queries without the indexes and totals"""
+    import random
+    import engine
+
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(), STATS_FILE)
+    store = STATS_STORE(path)
+
+    main_game = engine.MAIN(seed=seed)
+    store.start_game(main_game)
+    start = time.perf_counter()
+    for _ in range(100_000):
+        main_game.ticks += 1
+        store.answer(main_game, main_game.correct_fruit)
+    record = (time.perf_counter() - start) / 100_000
+    store.end_game(main_game)
+
+    start = time.perf_counter()
+    players = [f'player{index}' for index in range(100)]
+    for game_id in range(store.next_id, store.next_id + games):
+        player = players[rng.randrange(len(players))]
+        for tick in range(answers_per_game):
+            tier, op, correct = rng.randint(1, 4), rng.choice('+-*/'), rng.random() < 0.8
+            store.add(INSERT_ANSWER, (game_id, tick, tier, op, 1, 2, 3, correct, 1500))
+            store.add(ADD_TOTALS, (player, tier, op, 1, correct, 1500))
+        store.add(INSERT_GAME, (game_id, player, 0, 0, 100, rng.randrange(200), 2, 1, True, 1, 20, 1, 0))
+    store.next_id += games
+    store.close()
+    elapsed = time.perf_counter() - start
+    print(f"record an answer {record * 1e6:.2f} us on the game loop, {store.rows:,} rows written in {elapsed:.1f} s, "
+          f"{store.flushes} flushes {store.flush_time / store.flushes * 1000:.1f} ms mean "
+          f"{store.max_flush_time * 1000:.1f} ms max")
+
+    queries = [
+        ('leaderboard', lambda: store.leaderboard(10)),
+        ('leaderboard, no index', lambda: store.query(
+            'SELECT player, score, ended FROM games NOT INDEXED ORDER BY score DESC, ended LIMIT 10')),
+        ('player leaderboard', lambda: store.leaderboard(10, 'player7')),
+        ('accuracy', lambda: store.accuracy()),
+        ('accuracy from answers', lambda: store.query(
+            'SELECT tier, op, COUNT(*), SUM(correct), AVG(reaction_ms) FROM answers GROUP BY tier, op')),
+    ]
+    for name, query in queries:
+        start = time.perf_counter()
+        query()
+        print(f"{name:<24} {(time.perf_counter() - start) * 1000:10.2f} ms")
+
+
+if __name__ == '__main__':
+    # python stats_store.py [stats.db] for the leaderboard and accuracy report, python stats_store.py benchmark [games]
+    if len(sys.argv) > 1 and sys.argv[1] == 'benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
+    else:
+        store = STATS_STORE(sys.argv[1] if len(sys.argv) > 1 else STATS_FILE)
+        print(store.report())
+        store.close()
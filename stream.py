@@ -0,0 +1,242 @@
+import socket, struct, sys, time
+import engine
+from engine import DIRECTIONS, STATUS, NOTHING, GAME_OVER
+from question_bank import OPERATOR_CODES, OPERATOR_SYMBOLS
+
+# First byte of every frame
+KEYFRAME, DELTA = range(2)
+
+# Delta flags: the low 2 bits are the direction the head moved in
+MOVED = 1 << 2
+# Bits 3-4 count the tail blocks removed, 0 when growing, 2 when a wrong answer shrank the snake
+TAIL_SHIFT = 3
+FRUITS = 1 << 5
+QUESTION = 1 << 6
+EVENT = 1 << 7
+
+# Extra fields, in this order after the flags when their flag is set
+FRUITS_FIELDS = struct.Struct('<IiIi')   # correct cell and answer, bad cell and answer
+QUESTION_FIELDS = struct.Struct('<BBii')  # tier, operator code, a, b
+EVENT_FIELDS = struct.Struct('<B')
+
+
+class ENCODER:
+    """Turns a MAIN into a stream of frames, one per tick, for a DECODER to rebuild it from.
+
+    A keyframe is a whole MAIN.snapshot(exact=False). A delta is 2 bytes for a
+    tick where the snake just moved: the direction, whether it moved and how
+    many tail blocks went, plus fruit cells and answers when they respawned,
+    the question when it changed and the event when there was one. Only what
+    changed since the last frame is looked at, so encoding is O(1) however
+    long the snake. A keyframe is sent every keyframe_every frames, after a
+    game over, whenever the change doesn't fit a delta, and after a frame was
+    dropped (call skip()).
+    """
+
+    def __init__(self, main_game, keyframe_every=100):
+        self.main_game = main_game
+        self.keyframe_every = keyframe_every
+        self.since_keyframe = None
+
+        self.frames = 0
+        self.keyframes = 0
+        self.bytes = 0
+
+    def remember(self):
+        game = self.main_game
+        question = game.question
+        self.head = game.snake.body[0].copy()
+        self.length = len(game.snake.body)
+        self.fruits = (game.correct_fruit, game.bad_fruit)
+        self.question = (question.tier, question.op, question.a, question.b)
+
+    def keyframe(self):
+        self.since_keyframe = 0
+        self.keyframes += 1
+        return bytes([KEYFRAME]) + self.main_game.snapshot(exact=False)
+
+    def delta(self):
+        """Delta from the last frame, None if the change can't be sent as one"""
+        game = self.main_game
+        snake = game.snake
+        flags = 0
+        removed = self.length - len(snake.body)
+
+        step = snake.body[0] - self.head
+        if step != (0, 0):
+            if step not in DIRECTIONS:
+                return None
+            flags |= MOVED | DIRECTIONS.index(step)
+            removed += 1
+        if not 0 <= removed <= 2:
+            return None
+        flags |= removed << TAIL_SHIFT
+
+        fields = []
+        correct, bad = game.correct_fruit, game.bad_fruit
+        if (correct, bad) != self.fruits:
+            if len(game.bad_fruits) > 1:
+                # An arena's other fruits respawned too, which only a keyframe has room for
+                return None
+            flags |= FRUITS
+            fields.append(FRUITS_FIELDS.pack(correct.y * game.cell_number + correct.x, correct.answer,
+                                             bad.y * game.cell_number + bad.x, bad.answer))
+        question = game.question
+        if (question.tier, question.op, question.a, question.b) != self.question:
+            flags |= QUESTION
+            fields.append(QUESTION_FIELDS.pack(question.tier, OPERATOR_CODES[question.op], question.a, question.b))
+        if game.event != NOTHING:
+            flags |= EVENT
+            fields.append(EVENT_FIELDS.pack(game.event))
+        return bytes([DELTA, flags]) + b''.join(fields)
+
+    def encode(self):
+        """Frame for the game's latest tick"""
+        frame = None
+        if self.since_keyframe is not None and self.since_keyframe < self.keyframe_every \
+                and self.main_game.event != GAME_OVER:
+            frame = self.delta()
+        if frame is None:
+            frame = self.keyframe()
+        else:
+            self.since_keyframe += 1
+        self.remember()
+        self.frames += 1
+        self.bytes += len(frame)
+        return frame
+
+    def skip(self):
+        """The last frame never got to the client, so the next one has to be a keyframe"""
+        self.since_keyframe = None
+
+
+class DECODER:
+    """Applies ENCODER frames to a MAIN, a game.MAIN can then draw it with draw_elements as usual"""
+
+    def __init__(self, main_game):
+        self.main_game = main_game
+        self.synced = False
+
+    def decode(self, frame):
+        """Apply one frame, returns False for deltas that arrive before the first keyframe"""
+        game = self.main_game
+        view = memoryview(frame)
+        if frame[0] == KEYFRAME:
+            game.restore(view[1:])
+            self.synced = True
+            return True
+        if not self.synced:
+            return False
+
+        flags = frame[1]
+        offset = 2
+        snake = game.snake
+        if flags & MOVED:
+            snake.direction = DIRECTIONS[flags & 3]
+            snake.add_head(snake.body[0] + snake.direction)
+        for _ in range(flags >> TAIL_SHIFT & 3):
+            snake.drop_tail()
+
+        if flags & FRUITS:
+            correct_cell, correct_answer, bad_cell, bad_answer = FRUITS_FIELDS.unpack_from(view, offset)
+            offset += FRUITS_FIELDS.size
+            for fruit, cell, answer in ((game.correct_fruit, correct_cell, correct_answer), (game.bad_fruit, bad_cell, bad_answer)):
+                fruit.answer = answer
+                fruit.place(cell % game.cell_number, cell // game.cell_number)
+        if flags & QUESTION:
+            tier, op, a, b = QUESTION_FIELDS.unpack_from(view, offset)
+            offset += QUESTION_FIELDS.size
+            game.tier = game.question.tier = tier
+            game.question.set_question(a, b, OPERATOR_SYMBOLS[op])
+        game.event = NOTHING
+        if flags & EVENT:
+            game.event, = EVENT_FIELDS.unpack_from(view, offset)
+            game.question.set_status(*STATUS[game.event])
+        game.ticks += 1
+        return True
+
+
+def benchmark(lengths=(3, 100, 1000, 10000), ticks=2000):
+    """Bytes per tick and encode time for deltas against sending a snapshot every tick"""
+    from camera import serpentine
+    from tournament import greedy_policy
+
+    for length in lengths:
+        cell_number = max(engine.CELL_NUMBER, int((4 * length) ** 0.5) + 1)
+        main_game = engine.MAIN(cell_number, seed=0)
+        body = serpentine(cell_number, length)
+        main_game.snake.restore([int(b.y) * cell_number + int(b.x) for b in body], DIRECTIONS[engine.DOWN], False)
+        encoder = ENCODER(main_game)
+        mirror = DECODER(engine.MAIN(cell_number))
+
+        encode_time = snapshot_time = snapshot_bytes = 0
+        for _ in range(ticks):
+            main_game.step(greedy_policy(main_game))
+            start = time.perf_counter()
+            frame = encoder.encode()
+            encode_time += time.perf_counter() - start
+            mirror.decode(frame)
+
+            start = time.perf_counter()
+            snapshot_bytes += len(main_game.snapshot(exact=False))
+            snapshot_time += time.perf_counter() - start
+
+        assert list(mirror.main_game.snake.body) == list(main_game.snake.body)
+        print(f"length {length:>6} board {cell_number:>3}: deltas {encoder.bytes / ticks:8.1f} bytes/tick "
+              f"{encode_time / ticks * 1e6:7.2f} us/tick ({encoder.keyframes} keyframes), "
+              f"snapshots {snapshot_bytes / ticks:9.1f} bytes/tick {snapshot_time / ticks * 1e6:8.2f} us/tick")
+
+
+def view(host='127.0.0.1', port=8765):
+    """Watch and play a server.py session in a window, drawn by game.MAIN.draw_elements from the decoded stream"""
+    import pygame
+    import game
+    from server import FRAME
+
+    pygame.init()
+    game.init_display(engine.CELL_NUMBER)
+    main_game = game.MAIN(engine.CELL_NUMBER)
+    decoder = DECODER(main_game)
+    keys = {pygame.K_UP: engine.UP, pygame.K_RIGHT: engine.RIGHT, pygame.K_DOWN: engine.DOWN, pygame.K_LEFT: engine.LEFT}
+
+    connection = socket.create_connection((host, port))
+    connection.setblocking(False)
+    buffer = bytearray()
+    clock = pygame.time.Clock()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN and event.key in keys:
+                connection.sendall(FRAME.pack(1) + bytes([keys[event.key]]))
+
+        try:
+            data = connection.recv(65536)
+            if not data:
+                break
+            buffer += data
+        except BlockingIOError:
+            pass
+        while len(buffer) >= FRAME.size:
+            size, = FRAME.unpack_from(buffer)
+            if len(buffer) < FRAME.size + size:
+                break
+            decoder.decode(bytes(buffer[FRAME.size:FRAME.size + size]))
+            del buffer[:FRAME.size + size]
+
+        if decoder.synced:
+            game.window.fill((30, 30, 30))
+            game.screen.fill((175, 215, 70))
+            main_game.draw_elements()
+            game.window.blit(game.screen, (0, 0))
+            pygame.display.update()
+        clock.tick(60)
+
+
+if __name__ == '__main__':
+    # python stream.py to measure, python stream.py view [host] [port] to watch a server.py session
+    if len(sys.argv) > 1 and sys.argv[1] == 'view':
+        view(sys.argv[2] if len(sys.argv) > 2 else '127.0.0.1', int(sys.argv[3]) if len(sys.argv) > 3 else 8765)
+    else:
+        benchmark()
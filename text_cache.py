@@ -0,0 +1,47 @@
+from collections import OrderedDict
+import pygame
+
+
+class TEXT_CACHE:
+    """Rendered text surfaces keyed by (font, size, text, color), least recently used dropped first.
+
+    Fonts are loaded once per (font, size). font is a ttf path or None for
+    pygame's default font, the same as pygame.font.Font.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, name, size):
+        key = (name, size)
+        if key not in self.fonts:
+            self.fonts[key] = pygame.font.Font(name, size)
+        return self.fonts[key]
+
+    def render(self, text, size, color, font=None):
+        key = (font, size, text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(font, size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+    def report(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return (f"Text cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate), "
+                f"{len(self.surfaces)}/{self.max_size} surfaces, {len(self.fonts)} fonts")
@@ -0,0 +1,89 @@
+import math, time
+
+
+class TICKER:
+    """Fixed timestep for the game, independent of how often the window is drawn.
+
+    advance() is called once per frame and says how many ticks are due, using an
+    accumulator of elapsed time so ticks never drift however uneven the frames
+    are. After a stall at most max_catch_up ticks are run at once and the rest
+    are dropped, so the game doesn't fast-forward. Every tick's lateness (how
+    long after its scheduled time it ran) and the interval since the previous
+    tick are recorded for report().
+    """
+
+    def __init__(self, tick_ms=150, max_catch_up=5, late_ms=None, clock=time.perf_counter):
+        self.tick_length = tick_ms / 1000
+        self.max_catch_up = max_catch_up
+        # Ticks running later than this count as late, a quarter of a tick by default
+        self.late_after = (late_ms if late_ms is not None else tick_ms / 4) / 1000
+        self.clock = clock
+        self.accumulator = 0
+        self.last = None
+
+        self.ticks = 0
+        self.late_ticks = 0
+        self.dropped = 0
+        self.max_lateness = 0
+        self.total_lateness = 0
+        self.last_tick = None
+        # Running mean and sum of squares of tick intervals (Welford's method)
+        self.intervals = 0
+        self.interval_mean = 0
+        self.interval_m2 = 0
+
+    def reset(self):
+        """Start timing again from the next advance, e.g. after a pause"""
+        self.accumulator = 0
+        self.last = None
+        self.last_tick = None
+
+    def advance(self):
+        """Number of ticks to run now"""
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+            return 0
+        self.accumulator += now - self.last
+        self.last = now
+
+        count = int(self.accumulator // self.tick_length)
+        if count > self.max_catch_up:
+            self.dropped += count - self.max_catch_up
+            self.accumulator -= (count - self.max_catch_up) * self.tick_length
+            count = self.max_catch_up
+        self.accumulator -= count * self.tick_length
+
+        for index in range(count):
+            # Earlier ticks in a catch-up batch were due further in the past
+            self.record(now, self.accumulator + (count - 1 - index) * self.tick_length)
+        return count
+
+    def record(self, now, lateness):
+        self.ticks += 1
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness > self.late_after:
+            self.late_ticks += 1
+
+        if self.last_tick is not None:
+            interval = now - self.last_tick
+            self.intervals += 1
+            delta = interval - self.interval_mean
+            self.interval_mean += delta / self.intervals
+            self.interval_m2 += delta * (interval - self.interval_mean)
+        self.last_tick = now
+
+    def jitter(self):
+        """Standard deviation of the time between ticks, in seconds"""
+        if self.intervals < 2:
+            return 0
+        return math.sqrt(self.interval_m2 / (self.intervals - 1))
+
+    def report(self):
+        if not self.ticks:
+            return "No ticks run"
+        return (f"{self.ticks} ticks at {self.tick_length * 1000:.0f} ms: "
+                f"interval {self.interval_mean * 1000:.2f} ms, jitter {self.jitter() * 1000:.2f} ms, "
+                f"lateness mean {self.total_lateness / self.ticks * 1000:.2f} ms max {self.max_lateness * 1000:.2f} ms, "
+                f"{self.late_ticks} late (> {self.late_after * 1000:.1f} ms), {self.dropped} dropped")
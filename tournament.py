@@ -0,0 +1,159 @@
+import importlib, math, sys, time
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool, cpu_count
+import engine
+from engine import DIRECTIONS, CORRECT, WRONG, GAME_OVER
+
+
+def random_policy(main_game):
+    """Any direction, drawn from the game's own rng so a seed still replays"""
+    return main_game.rng.randrange(4)
+
+
+def greedy_policy(main_game):
+    """Step towards the correct fruit, never onto the board edge, the body, a bad fruit or an obstacle if there is a choice"""
+    snake = main_game.snake
+    head = snake.body[0]
+    target = main_game.correct_fruit.pos
+    entities, correct = main_game.entities, main_game.correct_fruit
+
+    best, best_distance = None, math.inf
+    for action, direction in enumerate(DIRECTIONS):
+        if direction == -snake.direction:
+            continue
+        cell = snake.cell(head + direction)
+        if cell is None or snake.grid[cell] or entities.get(cell) not in (None, correct):
+            continue
+        distance = abs(head.x + direction.x - target.x) + abs(head.y + direction.y - target.y)
+        if distance < best_distance:
+            best, best_distance = action, distance
+    return best
+
+
+def play(seed, policy, max_ticks=10_000, cell_number=engine.CELL_NUMBER, tier=1, distractors=1, obstacles=0):
+    """One headless game until the first game over or max_ticks.
+
+    Returns (seed, ticks, correct, wrong, length, died), length being the
+    snake's length just before it died or when time ran out.
+    """
+    main_game = engine.MAIN(cell_number, seed, tier, distractors=distractors, obstacles=obstacles)
+    snake = main_game.snake
+    correct = wrong = 0
+    length = len(snake.body)
+    for tick in range(1, max_ticks + 1):
+        event = main_game.step(policy(main_game))
+        if event == GAME_OVER:
+            return seed, tick, correct, wrong, length, True
+        if event == CORRECT:
+            correct += 1
+        elif event == WRONG:
+            wrong += 1
+        length = len(snake.body)
+    return seed, max_ticks, correct, wrong, length, False
+
+
+def play_batch(seeds, policy, max_ticks, cell_number, tier, distractors=1, obstacles=0):
+    """Every game in a batch, run in a worker and sent back as one list"""
+    return [play(seed, policy, max_ticks, cell_number, tier, distractors, obstacles) for seed in seeds]
+
+
+class STATS:
+    """Running totals of game results, with distributions of score (length - 3) and length"""
+
+    def __init__(self):
+        self.games = 0
+        self.ticks = 0
+        self.deaths = 0
+        self.correct = 0
+        self.wrong = 0
+        self.scores = Counter()
+        self.lengths = Counter()
+
+    def add(self, results):
+        for seed, ticks, correct, wrong, length, died in results:
+            self.games += 1
+            self.ticks += ticks
+            self.deaths += died
+            self.correct += correct
+            self.wrong += wrong
+            self.scores[length - 3] += 1
+            self.lengths[length] += 1
+
+    def percentile(self, counter, point):
+        """Nearest-rank percentile of a Counter of values"""
+        rank = max(1, math.ceil(point * sum(counter.values()) / 100))
+        seen = 0
+        for value in sorted(counter):
+            seen += counter[value]
+            if seen >= rank:
+                return value
+        return 0
+
+    def report(self, elapsed):
+        if not self.games:
+            return "No games played"
+        mean_score = sum(score * count for score, count in self.scores.items()) / self.games
+        return (f"{self.games:,} games in {elapsed:.2f} s, {self.games / elapsed:,.0f} games/sec, "
+                f"{self.ticks / elapsed:,.0f} ticks/sec\n"
+                f"score mean {mean_score:.2f} p50 {self.percentile(self.scores, 50)} "
+                f"p90 {self.percentile(self.scores, 90)} p99 {self.percentile(self.scores, 99)} max {max(self.scores)}\n"
+                f"length p50 {self.percentile(self.lengths, 50)} max {max(self.lengths)}, "
+                f"{self.correct / self.games:.2f} correct and {self.wrong / self.games:.2f} wrong per game, "
+                f"{self.deaths / self.games:.1%} died, mean {self.ticks / self.games:.0f} ticks")
+
+
+def run(policy, games=10_000, workers=None, batch=100, first_seed=0, max_ticks=10_000,
+        cell_number=engine.CELL_NUMBER, tier=1, on_batch=None, distractors=1, obstacles=0):
+    """Play games seeded first_seed onwards across a pool of workers, returns (STATS, seconds).
+
+    Seeds are handed out batch at a time and results come back as each batch
+    finishes, in whatever order, going to on_batch if given. policy is called
+    with the MAIN each tick and returns an action or None, and has to be a
+    module level function so it can be sent to the workers. workers=1 plays
+    in this process. distractors and obstacles are passed on to every MAIN.
+    """
+    play_seeds = partial(play_batch, policy=policy, max_ticks=max_ticks, cell_number=cell_number, tier=tier,
+                         distractors=distractors, obstacles=obstacles)
+    batches = [range(start, min(start + batch, first_seed + games)) for start in range(first_seed, first_seed + games, batch)]
+    stats = STATS()
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(play_seeds, batches)
+    else:
+        pool = Pool(workers or cpu_count())
+        results = pool.imap_unordered(play_seeds, batches)
+    try:
+        for batch_results in results:
+            stats.add(batch_results)
+            if on_batch:
+                on_batch(batch_results)
+    except BaseException:
+        # on_batch failed or Ctrl-C, stop the workers rather than waiting for every queued batch
+        if workers != 1:
+            pool.terminate()
+        raise
+    if workers != 1:
+        pool.close()
+        pool.join()
+    return stats, time.perf_counter() - start
+
+
+def load_policy(name):
+    """'module:function', or the name of a policy in this module"""
+    if ':' not in name:
+        return globals()[f'{name}_policy']
+    module, function = name.split(':')
+    return getattr(importlib.import_module(module), function)
+
+
+if __name__ == '__main__':
+    # python tournament.py [games] [workers] [policy], policy is greedy, random or module:function
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else cpu_count()
+    policy = load_policy(sys.argv[3] if len(sys.argv) > 3 else 'greedy')
+
+    stats, elapsed = run(policy, games, workers)
+    print(f"{policy.__name__} on {workers} worker(s)")
+    print(stats.report(elapsed))